@@ -0,0 +1,94 @@
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+CODE_DIR = Path(__file__).resolve().parent.parent
+
+#time budget for the top-level imports of one page in a fresh process (streamlit itself is already loaded there)
+DEFAULT_BUDGET_MS = 1000
+
+#modules no page may load before it draws a figure, they are loaded on first use (lazy_import)
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'scipy', 'altair', 'fastf1.plotting')
+
+#runs in the child process: imports of the page, then its first run without any selection (first paint)
+_PROBE = """
+import json, sys, time
+import streamlit
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+{imports}
+imports_ms = (time.perf_counter() - start) * 1000
+heavy = [name for name in {heavy!r} if name in sys.modules]
+start = time.perf_counter()
+AppTest.from_file({page!r}, default_timeout=120).run()
+first_run_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{'imports_ms': imports_ms, 'first_run_ms': first_run_ms, 'heavy': heavy}}))
+"""
+
+
+def pages():
+    """
+    Gibt die Startseite und alle Pages der App zurück.
+    Parameter: -
+    Return: Liste von Pfaden (relativ zum Ordner Code)
+    """
+    return ['Startseite.py'] + sorted(str(path.relative_to(CODE_DIR)) for path in (CODE_DIR / 'pages').glob('*.py'))
+
+
+def page_imports(page: str):
+    """
+    Liest die Imports auf oberster Ebene einer Page aus, das sind die Imports, die sie beim ersten Aufruf bezahlt.
+    Parameter: page (Pfad relativ zum Ordner Code)
+    Return: Quelltext der Imports
+    """
+    source = (CODE_DIR / page).read_text()
+    return '\n'.join(ast.get_source_segment(source, node) for node in ast.parse(source).body
+                     if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def measure_page(page: str, repeat: int = 3):
+    """
+    Misst in jeweils einem neuen Prozess (Kaltstart) die Dauer der Imports einer Page und ihres ersten Aufrufs ohne
+    Auswahl (erste Anzeige) und welche schweren Module dabei schon geladen werden.
+    Parameter: page, repeat (Prozesse pro Page, der Median zählt)
+    Return: dict mit imports_ms, first_run_ms, heavy
+    """
+    env = dict(os.environ)
+    env.setdefault('RACING_INSIGHTS_DATA_SOURCE', 'local')
+    env.setdefault('RACING_INSIGHTS_STORE', tempfile.mkdtemp(prefix='racing_insights_import_'))
+    probe = _PROBE.format(imports=page_imports(page), heavy=HEAVY_MODULES, page=page)
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', probe], cwd=CODE_DIR, env=env, capture_output=True,
+                                text=True, check=True)
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {'imports_ms': round(statistics.median(run['imports_ms'] for run in runs), 1),
+            'first_run_ms': round(statistics.median(run['first_run_ms'] for run in runs), 1),
+            'heavy': runs[0]['heavy']}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Importzeit und erste Anzeige jeder Page im Kaltstart, mit Budget.")
+    parser.add_argument('--repeat', type=int, default=3, help="Prozesse pro Page")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MS, help="erlaubte Importzeit pro Page in ms")
+    args = parser.parse_args()
+
+    failed = False
+    for page in pages():
+        result = measure_page(page, args.repeat)
+        problems = []
+        if result['imports_ms'] > args.budget:
+            problems.append(f"über dem Budget von {args.budget:.0f} ms")
+        if result['heavy']:
+            problems.append(f"lädt {', '.join(result['heavy'])}")
+        failed = failed or bool(problems)
+        print(f"{page:<28}Imports {result['imports_ms']:>7.0f} ms   erste Anzeige {result['first_run_ms']:>7.0f} ms"
+              + (f"  <-- {'; '.join(problems)}" if problems else ''))
+    if failed:
+        sys.exit(1)
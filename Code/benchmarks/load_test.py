@@ -0,0 +1,206 @@
+import os
+import tempfile
+
+#the load test runs against the local data source and, unless given, a fresh race store (cold start); both are read
+#when the utils modules are imported, so they have to be set first
+os.environ.setdefault('RACING_INSIGHTS_DATA_SOURCE', 'local')
+os.environ.setdefault('RACING_INSIGHTS_STORE', tempfile.mkdtemp(prefix='racing_insights_load_'))
+
+import argparse
+import json
+import logging
+import threading
+import time
+import warnings
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.util import build_mock_config_get_option
+
+from utils.figure_cache import figure_cache
+from utils.workers import pool, process_stats
+
+PAGES_DIR = Path(__file__).resolve().parent.parent / 'pages'
+PAGES = ['Geschwindigkeit', 'Positionsverlauf', 'Punkte', 'Rundenzeiten']
+
+#seconds a single rerun may take before AppTest gives up (a cold race load in the local source takes ~1 s)
+RUN_TIMEOUT = 300
+
+
+def _share_runtime():
+    #every AppTest run installs its own mock runtime and removes it when done, which breaks other runs in flight.
+    #a streamlit server has one runtime for all sessions, so the last installed one is kept for everybody
+    last = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last['runtime'] = cls._instance
+        return last['runtime']
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: 'runtime' in last or cls._instance is not None)
+
+    #every run also patches config.get_option and restores it when done; overlapping runs restore out of order and
+    #switch the test mode off for a run in flight, so the patched version stays for the whole load test
+    config.get_option = build_mock_config_get_option({'global.appTest': True})
+
+
+def _timed_run(at, latencies, step):
+    start = time.perf_counter()
+    at.run()
+    latencies.append((step, time.perf_counter() - start))
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def visit_page(page: str, year: int, rng):
+    """
+    Simuliert einen Besuch einer Page wie ein User: Page öffnen, Saison und Rennen wählen, Fahrer wählen und eine
+    Option umschalten. Jeder Schritt ist ein Rerun des Skripts.
+    Parameter: page, year, rng (numpy Generator)
+    Return: latencies (Liste von (Schritt, Sekunden))
+    """
+    latencies = []
+    at = AppTest.from_file(str(PAGES_DIR / f"{page}.py"), default_timeout=RUN_TIMEOUT)
+    _timed_run(at, latencies, 'open')
+
+    at.selectbox[0].set_value(year)
+    _timed_run(at, latencies, 'season')
+
+    if page != 'Punkte':
+        races = at.selectbox[1].options
+        at.selectbox[1].set_value(races[rng.integers(len(races))])
+        _timed_run(at, latencies, 'race')
+
+    drivers = at.multiselect[0].options
+    n_drivers = 4 if page == 'Rundenzeiten' and rng.random() < 0.5 else 2
+    at.multiselect[0].set_value([drivers[i] for i in rng.choice(len(drivers), n_drivers, replace=False)])
+    _timed_run(at, latencies, 'drivers')
+
+    if page == 'Positionsverlauf':
+        at.radio[0].set_value('TimeBehindLeaderSeconds')
+        _timed_run(at, latencies, 'option')
+    elif page == 'Rundenzeiten':
+        at.selectbox[2].set_value('Ja')
+        _timed_run(at, latencies, 'option')
+    return latencies
+
+
+def _user(user_id: int, seasons, visits: int, think_time: float, results, errors):
+    rng = np.random.default_rng(user_id)
+    for _ in range(visits):
+        page = PAGES[rng.integers(len(PAGES))]
+        year = seasons[rng.integers(len(seasons))]
+        try:
+            for step, seconds in visit_page(page, year, rng):
+                results.append({'user': user_id, 'page': page, 'step': step, 'seconds': seconds})
+        except Exception as e:
+            errors.append(f"{page} {year}: {type(e).__name__}: {e}")
+        time.sleep(think_time)
+
+
+def _percentiles(seconds):
+    return {'n': len(seconds), 'p50_ms': round(float(np.percentile(seconds, 50)) * 1000, 1),
+            'p95_ms': round(float(np.percentile(seconds, 95)) * 1000, 1),
+            'max_ms': round(max(seconds) * 1000, 1)}
+
+
+def _hit_rate(hits: int, misses: int):
+    return round(hits / (hits + misses), 3) if hits + misses else None
+
+
+def _cache_hit_rates(stats):
+    return {name: _hit_rate(stats.get(f"{name}_hits", 0), stats.get(f"{name}_misses", 0))
+            for name in ('sessions', 'race_store', 'fastf1')}
+
+
+def run_load_test(users: int = 10, visits: int = 5, seasons=(2023, 2024), think_time: float = 0.0):
+    """
+    Lässt users simulierte User gleichzeitig (je ein Thread, wie die Sessions eines Streamlit-Servers) durch die vier
+    Pages gehen und misst die Dauer jedes Reruns, den Spitzenwert des Speichers (RSS) von App- und Worker-Prozessen und
+    die Trefferquoten der Caches.
+    Parameter: users, visits (Page-Besuche pro User), seasons, think_time (Sekunden zwischen den Besuchen)
+    Return: dict mit Latenzen pro Page und Schritt, Speicher, Cache-Trefferquoten und Fehlern
+    """
+    _share_runtime()
+    results = []
+    errors = []
+    threads = [threading.Thread(target=_user, args=(i, list(seasons), visits, think_time, results, errors))
+               for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    #loading, cleaning and rendering run in the worker processes, each of them reports its own caches and peak RSS
+    #(the peaks need not coincide in time, so their sum is an upper bound)
+    app = process_stats()
+    workers = pool.worker_stats()
+    totals = Counter(app['cache_stats'])
+    for worker in workers:
+        totals.update(worker['cache_stats'])
+    figures = figure_cache.stats()
+    app_rss = app['peak_rss_mb']
+    worker_rss = [worker['peak_rss_mb'] for worker in workers]
+    return {
+        'users': users,
+        'visits_per_user': visits,
+        'seasons': list(seasons),
+        'elapsed_s': round(elapsed, 1),
+        'reruns_per_s': round(len(results) / elapsed, 2),
+        'pages': {page: _percentiles([r['seconds'] for r in results if r['page'] == page])
+                  for page in PAGES if any(r['page'] == page for r in results)},
+        'steps': {step: _percentiles([r['seconds'] for r in results if r['step'] == step])
+                  for step in dict.fromkeys(r['step'] for r in results)},
+        'all': _percentiles([r['seconds'] for r in results]) if results else None,
+        'peak_rss_mb': {'app': app_rss, 'workers': worker_rss, 'total': round(app_rss + sum(worker_rss), 1)},
+        #summed over the app and all worker processes, the figure cache only exists in the app process
+        'cache_hit_rates': {**_cache_hit_rates(totals), 'figures': _hit_rate(figures['hits'], figures['misses'])},
+        'worker_cache_hit_rates': [_cache_hit_rates(worker['cache_stats']) for worker in workers],
+        #the thread backend renders in the app process
+        'figures_rendered': [worker['figures_rendered'] for worker in workers] or [app['figures_rendered']],
+        'worker_jobs': pool.stats(),
+        'errors': errors,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Lasttest der vier Pages mit simulierten Usern und lokaler "
+                                                 "Datenquelle.")
+    parser.add_argument('--users', type=int, default=10, help="gleichzeitige User")
+    parser.add_argument('--visits', type=int, default=5, help="Page-Besuche pro User")
+    parser.add_argument('--seasons', type=int, nargs='+', default=[2023, 2024])
+    parser.add_argument('--think-time', type=float, default=0.0, help="Sekunden zwischen zwei Page-Besuchen")
+    parser.add_argument('--output', help="Resultate zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    report = run_load_test(args.users, args.visits, args.seasons, args.think_time)
+    print(f"{report['users']} User, {report['visits_per_user']} Besuche pro User, {report['elapsed_s']} s, "
+          f"{report['reruns_per_s']} Reruns/s")
+    for name, values in list(report['pages'].items()) + ([('alle', report['all'])] if report['all'] else []):
+        print(f"{name:<18} n={values['n']:<5} p50 {values['p50_ms']:>8.1f} ms   p95 {values['p95_ms']:>8.1f} ms   "
+              f"max {values['max_ms']:>8.1f} ms")
+    rss = report['peak_rss_mb']
+    print(f"Peak RSS: App {rss['app']} MB, Worker " + (", ".join(f"{peak} MB" for peak in rss['workers']) or "-")
+          + f", gesamt {rss['total']} MB")
+    print("Cache-Trefferquoten: " + ", ".join(f"{name} {rate}" for name, rate in report['cache_hit_rates'].items()))
+    for i, (rates, rendered) in enumerate(zip(report['worker_cache_hit_rates'], report['figures_rendered'])):
+        print(f"Worker {i}: " + ", ".join(f"{name} {rate}" for name, rate in rates.items())
+              + ", gerendert " + (", ".join(f"{chart} {n}" for chart, n in rendered.items()) or "-"))
+    print("Worker-Jobs: " + ", ".join(f"{name} {value}" for name, value in report['worker_jobs'].items()))
+    if report['errors']:
+        print(f"{len(report['errors'])} Fehler, z.B. {report['errors'][0]}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
@@ -0,0 +1,55 @@
+import argparse
+import io
+import logging
+import warnings
+
+from utils.data_source import LocalSource, source
+from utils.helper_functions import data_cleaner, load_data
+
+
+def _footprint(laps):
+    buffer = io.BytesIO()
+    laps.to_parquet(buffer, compression='zstd')
+    return {'memory_mb': laps.memory_usage(deep=True).sum() / 1e6, 'parquet_mb': buffer.tell() / 1e6,
+            'columns': laps.shape[1]}
+
+
+def measure_laps(session):
+    """
+    Misst den Speicherbedarf der bereinigten Runden eines Rennens mit den Datentypen von fastf1 und im kompakten
+    Schema (im Speicher inklusive Texte und als Parquet-Datei im Race Store).
+    Parameter: session (geladen mit Runden und Wetter)
+    Return: dict 'full' und 'compact' mit memory_mb, parquet_mb, columns
+    """
+    return {'full': _footprint(data_cleaner(session, compact=False)[1]),
+            'compact': _footprint(data_cleaner(session, compact=True)[1])}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Speicherbedarf der bereinigten Runden vorher/nachher (kompaktes "
+                                                 "Schema).")
+    parser.add_argument('year', type=int, nargs='?', default=2024)
+    parser.add_argument('rounds', type=int, nargs='*', default=[1])
+    parser.add_argument('--live', action='store_true',
+                        help="Rennen über die konfigurierte Datenquelle laden statt synthetisch")
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore', FutureWarning)
+    logging.getLogger('fastf1').setLevel(logging.ERROR)
+
+    synthetic = LocalSource(recordings_dir=None)
+    for race_nr in args.rounds:
+        if args.live:
+            session = load_data(args.year, race_nr, profile='laps')
+            label = f"{args.year} Rennen {race_nr} ({type(source).__name__})"
+        else:
+            session = synthetic.get_session(args.year, race_nr)
+            session.load()
+            label = f"{args.year} Rennen {race_nr} (synthetisch)"
+        result = measure_laps(session)
+        full, compact = result['full'], result['compact']
+        print(f"{label}:")
+        for name in ('memory_mb', 'parquet_mb'):
+            print(f"  {name:<11}{full[name]:>8.2f} MB -> {compact[name]:>6.2f} MB "
+                  f"({compact[name] / full[name]:.0%})")
+        print(f"  Spalten    {full['columns']:>8} -> {compact['columns']:>6}")
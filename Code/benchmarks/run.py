@@ -0,0 +1,169 @@
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+
+import fastf1
+import numpy as np
+import pandas as pd
+
+from utils.charts import build_lap_times_figure, build_points_figure, build_position_figure, build_speed_figure
+from utils.data_source import LocalSource
+from utils.figure_cache import render_figure
+from utils.gaps import compute_gaps
+from utils.helper_functions import data_cleaner
+from utils.race_data import RaceData
+from utils.standings import _materialize, season_summary
+from utils.stints import stint_table
+from utils.synthetic_data import synthetic_fastest_laps, synthetic_season_results
+from utils.telemetry import downsample_track, resample_telemetry
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+#a case is reported as regression when its median is slower than the reference by more than this share
+DEFAULT_TOLERANCE = 0.2
+
+
+def _cases():
+    #fixtures are built once (always synthetic, recordings would make runs incomparable), only the calls returned
+    #here are timed
+    session = LocalSource(recordings_dir=None).get_session(2024, 1)
+    session.load()
+    driver_info, laps = data_cleaner(session)
+    race = RaceData(2024, 1, driver_info, laps, session=session)
+    car_data = session.car_data
+    fastest = synthetic_fastest_laps(['VER', 'LEC'])
+    drivers, series = season_summary(_materialize(synthetic_season_results()))
+    season_results = synthetic_season_results()
+
+    def speed_figure():
+        return build_speed_figure(fastest, driver_info, ['VER', 'LEC'], 2024, 'Synthetic Grand Prix')
+
+    def position_figure():
+        return build_position_figure(race, [], 'Position', 'Synthetic Grand Prix')
+
+    def lap_times_figure():
+        return build_lap_times_figure(race, ['VER', 'LEC', 'NOR', 'HAM'], 'Nein', 'Synthetic Grand Prix')
+
+    def points_figure():
+        return build_points_figure(drivers, series, ['VER', 'NOR'], 2024)
+
+    def speed_figure_build():
+        matplotlib.pyplot.close(speed_figure())
+
+    return {
+        'data_cleaner': lambda: data_cleaner(session),
+        'standings_aggregation': lambda: season_summary(_materialize(season_results)),
+        'resample_telemetry': lambda: resample_telemetry([fastest[d]['telemetry'] for d in ('VER', 'LEC')]),
+        'downsample_track': lambda: downsample_track(fastest['VER']['telemetry']),
+        'gap_engine': lambda: compute_gaps(car_data, laps),
+        'stint_table': lambda: stint_table(laps),
+        'speed_figure_build': speed_figure_build,
+        'render_geschwindigkeit': lambda: render_figure(speed_figure()),
+        'render_positionsverlauf': lambda: render_figure(position_figure()),
+        'render_punkte': lambda: render_figure(points_figure()),
+        'render_rundenzeiten': lambda: render_figure(lap_times_figure()),
+    }
+
+
+def _time_case(call, repeat: int):
+    call()  #warm-up (imports, font cache, first allocation)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(timings), 3), 'min_ms': round(min(timings), 3),
+            'max_ms': round(max(timings), 3), 'repeat': repeat}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(repeat: int = 5, only=None):
+    """
+    Führt alle Benchmarks mit synthetischen Daten aus (ohne Netzwerk) und misst pro Fall Median, Minimum und Maximum.
+    Parameter: repeat (Messungen pro Fall), only (optionale Liste von Fällen)
+    Return: dict mit Umgebung und Resultaten pro Fall
+    """
+    #tight_layout and font fallback warnings of the figures would drown the measurements
+    warnings.simplefilter('ignore', UserWarning)
+    warnings.simplefilter('ignore', FutureWarning)
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+    cases = _cases()
+    results = {}
+    for name, call in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = _time_case(call, repeat)
+        print(f"{name:<26}{results[name]['median_ms']:>10.1f} ms (min {results[name]['min_ms']:.1f})")
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}",
+        'packages': {'pandas': pd.__version__, 'numpy': np.__version__, 'matplotlib': matplotlib.__version__,
+                     'fastf1': fastf1.__version__},
+        'cases': results,
+    }
+
+
+def compare(current, reference, tolerance: float = DEFAULT_TOLERANCE):
+    """
+    Vergleicht die Mediane zweier Läufe und gibt die Fälle zurück, die um mehr als tolerance langsamer geworden sind.
+    Parameter: current, reference (Resultate von run_benchmarks), tolerance
+    Return: regressions (dict Fall -> Verhältnis aktuell / Referenz)
+    """
+    regressions = {}
+    for name, result in current['cases'].items():
+        if name not in reference['cases']:
+            continue
+        ratio = result['median_ms'] / reference['cases'][name]['median_ms']
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions[name] = ratio
+            flag = '  <-- langsamer'
+        print(f"{name:<26}{reference['cases'][name]['median_ms']:>10.1f} ms -> {result['median_ms']:>8.1f} ms "
+              f"({ratio:.2f}x){flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks der Datenaufbereitung und Grafiken mit synthetischen "
+                                                 "Daten.")
+    parser.add_argument('--repeat', type=int, default=5, help="Messungen pro Fall")
+    parser.add_argument('--only', nargs='*', help="nur diese Fälle ausführen")
+    parser.add_argument('--save', metavar='NAME', help="Resultate unter benchmarks/results/NAME.json speichern")
+    parser.add_argument('--compare', metavar='NAME', help="mit benchmarks/results/NAME.json vergleichen")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="erlaubte Verlangsamung pro Fall (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    current = run_benchmarks(args.repeat, args.only)
+
+    if args.save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        (RESULTS_DIR / f"{args.save}.json").write_text(json.dumps(current, indent=1))
+
+    if args.compare:
+        reference = json.loads((RESULTS_DIR / f"{args.compare}.json").read_text())
+        print(f"\nVergleich mit {args.compare} (Commit {reference['commit']}, {reference['created']}):")
+        if compare(current, reference, args.tolerance):
+            sys.exit(1)
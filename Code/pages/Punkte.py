@@ -1,97 +1,73 @@
 import streamlit as st
-import matplotlib.pyplot as plt
-import fastf1.plotting
 import pandas as pd
-from utils.helper_functions import load_races, load_data, data_cleaner
-
-#load agreed on color scheme from package
-fastf1.plotting.setup_mpl(mpl_timedelta_support=False, misc_mpl_mods=False,
-                          color_scheme='fastf1')
-
-#fastf1.Cache.enable_cache('./f1_cache')  # Lokaler Cache empfohlen!
-
-st.title("Punkteverlauf in einer Saison")
-st.subheader("Filtere Jahr um den Punkteverlauf der Fahrer zu sehen")
-
-#ask user to choose year
-year = st.selectbox("Wähle eine Saison zwischen 2018 und 2025", [2018, 2019, 2020, 2021, 2022, 2023, 2024, 2025],
-                      index=None, placeholder="Saison")
-
-if year: #only continue in code once year has been chosen by user
-    #load race calendar for that year
-    calendar = load_races(year)
-    calendar_filtered = pd.DataFrame(calendar[["RoundNumber", "EventName"]])
-
-    @st.cache_data(show_spinner=False)
-    def load_all_race_results(year, calendar_filtered):
-        combined_df = pd.DataFrame()
-
-        for roundnr in calendar_filtered["RoundNumber"]:
-            # Get RoundNumber and EventName
-            r_nr = calendar_filtered.loc[calendar_filtered["RoundNumber"] == roundnr, "RoundNumber"].values[0]
-            event_name = calendar_filtered.loc[calendar_filtered["RoundNumber"] == roundnr, "EventName"].values[0]
-
-            # Load session (no telemetry, no weather)
-            session = fastf1.get_session(year, roundnr, 'Race')
-            session.load(telemetry=False, weather=False)
-
-            # Select relevant columns
-            results = session.results
-            results_filter = pd.DataFrame(results[["DriverNumber", "Abbreviation", "FullName", "TeamName", "TeamColor", "CountryCode", "Points"]])
-            results_filter["RoundNumber"] = r_nr
-            results_filter["EventName"] = event_name
-
-            # Append to combined dataframe
-            combined_df = pd.concat([combined_df, results_filter], ignore_index=True)
-
-        return combined_df
-
-    with st.spinner("Daten werden geladen ..."):
-        combined_df = load_all_race_results(year, calendar_filtered)
-
-    #cumulative summe der Punkte für jedes Rennen, für die Visualisierung
-    combined_df["CumulativePoints"] = combined_df.sort_values("RoundNumber") \
-        .groupby("Abbreviation")["Points"] \
-        .cumsum()
-     
-    # Final Points for each Driver
-    final_points = combined_df.groupby("Abbreviation")["CumulativePoints"].max()
-    sorted_drivers = final_points.sort_values(ascending=False).index.tolist()
-
-    # Mapping von Abbreviation → CustomDriverName
-    combined_df["CustomDriverName"] = (
-        combined_df["DriverNumber"] + " - " +
-        combined_df["FullName"] + " - " +
-        combined_df["TeamName"]
-    )
-    name_map = combined_df.drop_duplicates("Abbreviation").set_index("Abbreviation")["CustomDriverName"].to_dict()
-
-    # Labels in format "44 - Lewis Hamilton - Mercedes" (like in Rundenzeiten.py), sorted by Point
-    driver_labels = [name_map[abbr] for abbr in final_points.sort_values(ascending=False).index]
-    driver_map = {label: abbr for label, abbr in zip(driver_labels, final_points.sort_values(ascending=False).index)}
-
-    # Multiselect
-    highlight_labels = st.multiselect("Beliebige Anzahl an Fahrer zum Hervorheben auswählen:", options=driver_labels, default=[])
-    highlight_drivers = [driver_map[label] for label in highlight_labels]
-
-    # Plot-Setup
-    fig, ax = plt.subplots(figsize=(12, 8))
-
-    # Driver sorted by points
-    for driver in sorted_drivers:
-        group = combined_df[combined_df["Abbreviation"] == driver]
-        color = "#" + group["TeamColor"].iloc[0]
-
-        # Hihglight Driver when selected
-        if not highlight_drivers or driver in highlight_drivers:
-            ax.plot(group["RoundNumber"], group["CumulativePoints"], label=driver, color=color, linewidth=2.5)
+from utils.helper_functions import load_races
+from utils.calendar_index import SEASONS
+from utils.standings import season_summary
+from utils.profiling import span
+from utils.profiling_panel import page_trace
+from utils.app_init import lazy_import
+from utils.workers import season_standings, submit_figure, await_job
+
+#interactive charts are imported on first use, only the interactive view needs altair
+interactive_charts = lazy_import('utils.interactive_charts')
+
+#optional profiling of this rerun (toggle in the sidebar), ends when the page stops early too
+with page_trace("Punkte"):
+    st.title("Punkteverlauf in einer Saison")
+    st.subheader("Filtere Jahr um den Punkteverlauf der Fahrer zu sehen")
+
+    #ask user to choose year
+    year = st.selectbox("Wähle eine Saison zwischen 2018 und 2025", SEASONS,
+                          index=None, placeholder="Saison")
+
+    if year: #only continue in code once year has been chosen by user
+        #load race calendar for that year
+        calendar = load_races(year)
+        calendar_filtered = pd.DataFrame(calendar[["RoundNumber", "EventName"]])
+
+        @st.cache_data(show_spinner=False)
+        def get_standings(year, calendar_filtered):
+            #materialized standings from the race store, only rounds not stored yet are loaded and appended (in a worker
+            #process, the loop over the season doesn't run in this thread)
+            standings, failures = season_standings(year, calendar_filtered)
+            if standings is None or standings.empty:
+                return None, None, failures
+            drivers, series = season_summary(standings)
+            return drivers, series, failures
+
+        with st.spinner("Daten werden geladen ..."), span('cache_data.get_standings'):
+            drivers, driver_series, failed_rounds = get_standings(year, calendar_filtered)
+
+        if failed_rounds:
+            #don't keep the incomplete season in the cache (only this season), the next rerun retries the missing rounds
+            get_standings.clear(year, calendar_filtered)
+            st.warning("Folgende Rennen konnten nicht geladen werden und fehlen im Punkteverlauf: "
+                       + ", ".join(f"Rennen {r_nr}" for r_nr in failed_rounds))
+
+        if drivers is None:
+            st.info("Für diese Saison gibt es noch keine Punkte.")
+            st.stop()
+
+        #interactive mode: the season goes to the browser once, highlighting and hover are handled there without a rerun
+        interactive = st.toggle("Interaktive Grafik", key="interactive",
+                                help="Fahrer in der Grafik oder Legende anklicken (Shift für mehrere)")
+
+        if interactive:
+            with span('st.altair_chart'):
+                st.altair_chart(interactive_charts.build_points_chart(drivers, driver_series, year), width="stretch")
         else:
-            ax.plot(group["RoundNumber"], group["CumulativePoints"], label=driver, color=color, alpha=0.2, linewidth=1.0)
-
-    ax.set_title(f"Total Punkte der Fahrer – Saison {year}")
-    ax.set_xlabel("Rennen")
-    ax.set_ylabel("Total Punkte")
-    ax.legend(loc='upper left', bbox_to_anchor=(1, 1), title="Fahrer (nach Punkten)")
-    ax.grid(True, linestyle='--', alpha=0.5)
-    st.pyplot(fig)
-
+            # Labels in format "44 - Lewis Hamilton - Mercedes" (like in Rundenzeiten.py), sorted by Point
+            driver_labels = drivers["CustomDriverName"].tolist()
+            driver_map = dict(zip(driver_labels, drivers.index))
+
+            # Multiselect
+            highlight_labels = st.multiselect("Beliebige Anzahl an Fahrer zum Hervorheben auswählen:", options=driver_labels, default=[])
+            highlight_drivers = [driver_map[label] for label in highlight_labels]
+
+            #rendered figures are cached per season (with its loaded rounds) and highlight selection
+            png = await_job(submit_figure(('Punkte', year, tuple(calendar_filtered["RoundNumber"]), tuple(failed_rounds),
+                                           tuple(highlight_drivers)),
+                                          drivers, driver_series, highlight_drivers, year),
+                            "Grafik wird erstellt ...")
+            with span('st.image'):
+                st.image(png, width="stretch")
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from utils.gaps import compute_gaps, race_progress
+
+LAP_SECONDS = 90.0
+SPEED = 200.0
+
+
+def _car_data(end_seconds: float, step: float = 0.5):
+    seconds = np.arange(0, end_seconds + step, step)
+    return pd.DataFrame({'SessionTime': pd.to_timedelta(seconds, unit='s'), 'Speed': SPEED})
+
+
+def _laps(driver: str, number: str, n_laps: int, delay: float = 0.0):
+    lap_numbers = np.arange(1, n_laps + 1)
+    return pd.DataFrame({
+        'DriverNumber': number,
+        'Driver': driver,
+        'LapNumber': lap_numbers.astype(float),
+        'LapStartTime': pd.to_timedelta((lap_numbers - 1) * LAP_SECONDS + delay, unit='s'),
+        'Time': pd.to_timedelta(lap_numbers * LAP_SECONDS + delay, unit='s'),
+    })
+
+
+def _race():
+    #two finishers 2 s apart and a retiree who completed lap 1 without a LapStartTime (only one anchor)
+    retiree = _laps('RET', '3', 1, delay=5.0).assign(LapStartTime=pd.NaT)
+    laps = pd.concat([_laps('AAA', '1', 3), _laps('BBB', '2', 3, delay=2.0), retiree], ignore_index=True)
+    car_data = {'1': _car_data(3 * LAP_SECONDS), '2': _car_data(3 * LAP_SECONDS + 2), '3': _car_data(LAP_SECONDS + 5)}
+    return car_data, laps
+
+
+def test_race_progress_drops_drivers_without_two_samples():
+    car_data, laps = _race()
+    tracks = race_progress(car_data, laps)
+    assert set(tracks) == {'AAA', 'BBB'}
+    assert all(len(progress) >= 2 for _, progress in tracks.values())
+
+
+def test_compute_gaps_with_retiree():
+    car_data, laps = _race()
+    gaps = compute_gaps(car_data, laps)
+    assert set(gaps['Driver']) == {'AAA', 'BBB'}
+    behind = gaps[gaps['Driver'] == 'BBB']
+    assert np.allclose(behind['GapToLeader'], 2.0, atol=0.05)
+    assert np.allclose(behind['GapToAhead'], 2.0, atol=0.05)
+    assert (gaps.loc[gaps['Driver'] == 'AAA', 'GapToLeader'] == 0).all()
+
+
+def test_compute_gaps_only_retirees():
+    car_data, laps = _race()
+    gaps = compute_gaps({'3': car_data['3']}, laps[laps['Driver'] == 'RET'])
+    assert gaps.empty
+    assert list(gaps.columns) == ['Driver', 'Progress', 'GapToLeader', 'GapToAhead']
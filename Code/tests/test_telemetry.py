@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from utils.telemetry import downsample_track
+
+
+def _lap(n: int = 2000):
+    #oval with a speed trace that has its extremes away from the corners
+    angle = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    speed = 200 + 80 * np.sin(3 * angle) + 5 * np.cos(17 * angle)
+    return pd.DataFrame({'X': 3000 * np.cos(angle), 'Y': 1000 * np.sin(angle), 'Speed': speed})
+
+
+def test_downsample_keeps_at_most_max_points():
+    lap = _lap()
+    for max_points in (5, 50, 300):
+        track = downsample_track(lap, max_points)
+        assert len(track) <= max_points
+        assert lap['Speed'].idxmin() in track.index and lap['Speed'].idxmax() in track.index
+
+
+def test_downsample_with_missing_values():
+    lap = _lap()
+    reference = downsample_track(lap, 300)
+    lap.loc[[0, 700, 701], 'Speed'] = np.nan
+    lap.loc[1200, 'X'] = np.nan
+    track = downsample_track(lap, 300)
+    assert len(track) <= 300
+    #the selection still follows the shape instead of collapsing onto the first bucket points
+    assert len(track.index.intersection(reference.index)) > 0.8 * len(reference)
@@ -0,0 +1,53 @@
+import importlib
+import threading
+
+#agreed on color scheme of the app ("Farbschema" in the README), applied once per process before the first matplotlib
+#figure is drawn. These are the arguments of Positionsverlauf, Punkte and Rundenzeiten; Geschwindigkeit called
+#setup_mpl() without arguments, but setup_mpl only ever adds to the process-wide rcParams, so its figure only had
+#matplotlib's default look if it was the first page of the process and the fastf1 one after any other page. No chart
+#plots timedeltas, so the timple converters it registered didn't change any figure (misc_mpl_mods has no effect since
+#fastf1 3.6)
+PLOTTING_SETUP = {'mpl_timedelta_support': False, 'color_scheme': 'fastf1'}
+
+_plotting_lock = threading.Lock()
+_plotting_ready = False
+
+
+class _LazyModule:
+    #the import system locks per module, so concurrent sessions importing on first use are safe (the LazyLoader of
+    #importlib is not before python 3.12)
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(importlib.import_module(self._name), attribute)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_import(name: str):
+    """
+    Gibt ein Modul zurück, das erst beim ersten Zugriff auf eines seiner Attribute geladen wird. So zahlt eine Page
+    schwere Imports (matplotlib, seaborn, altair) nur, wenn sie eine Grafik wirklich erstellt, und nicht beim Start oder
+    wenn die fertige Grafik aus dem Cache kommt.
+    Parameter: name (z.B. 'utils.charts')
+    Return: module (Platzhalter mit den Attributen des Moduls)
+    """
+    return _LazyModule(name)
+
+
+def setup_plotting():
+    """
+    Richtet matplotlib einmal pro Prozess mit dem Farbschema von fastf1 ein (vorher bei jedem Rerun jeder Page).
+    Wird beim Import von charts aufgerufen, also erst wenn die erste matplotlib-Grafik erstellt wird; weitere Aufrufe
+    tun nichts.
+    Parameter: -
+    Return: None
+    """
+    global _plotting_ready
+    with _plotting_lock:
+        if _plotting_ready:
+            return
+        importlib.import_module('fastf1.plotting').setup_mpl(**PLOTTING_SETUP)
+        _plotting_ready = True
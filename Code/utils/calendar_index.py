@@ -0,0 +1,112 @@
+import re
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+from utils import race_store
+from utils.data_source import source
+
+#seasons offered in the pages
+SEASONS = [2018, 2019, 2020, 2021, 2022, 2023, 2024, 2025]
+
+#the schedule of the running season is fetched again after this many seconds, older seasons never change
+CURRENT_SEASON_REFRESH_SECONDS = 6 * 3600
+
+#name of the season table in the race store
+CALENDAR_TABLE = 'calendar'
+
+_index = {}
+#one lock per season (fetching a schedule must not block lookups of other seasons), _index_lock only guards the dict
+_season_locks = {}
+_index_lock = threading.Lock()
+
+
+def _custom_event_names(calendar):
+    #remove the doubling of event locations (e.g. "Bahrain Grand Prix - Sakhir" but "Monaco Grand Prix")
+    location_in_name = [bool(re.search(r'\b' + re.escape(location) + r'\b', event_name, re.IGNORECASE))
+                        for location, event_name in zip(calendar['Location'], calendar['EventName'])]
+    rounds = " - Rennen " + calendar['RoundNumber'].astype(str)
+    return calendar['EventName'].where(location_in_name, calendar['EventName'] + " - " + calendar['Location']) + rounds
+
+
+def _fetch_calendar(year: int):
+    calendar = pd.DataFrame(source.get_event_schedule(year))
+    calendar = calendar[['RoundNumber', 'Country', 'Location', 'EventName', 'EventDate']].copy()
+    calendar['CustomEventName'] = _custom_event_names(calendar)
+    return calendar
+
+
+def _stored_calendar(year: int):
+    #stored schedule, unless it belongs to the running season and is older than the refresh interval
+    path = race_store.season_path(year) / f"{CALENDAR_TABLE}.parquet"
+    if not path.exists():
+        return None
+    if year >= date.today().year and time.time() - path.stat().st_mtime > CURRENT_SEASON_REFRESH_SECONDS:
+        return None
+    return race_store.load_season_table(year, CALENDAR_TABLE)
+
+
+def _is_fresh(year: int, entry):
+    return entry is not None and not (year >= date.today().year
+                                      and time.time() - entry['built'] > CURRENT_SEASON_REFRESH_SECONDS)
+
+
+def _season_entry(year: int):
+    entry = _index.get(year)
+    if _is_fresh(year, entry):
+        return entry
+
+    with _index_lock:
+        season_lock = _season_locks.setdefault(year, threading.Lock())
+    with season_lock:
+        #another session may have built the season while this one waited
+        entry = _index.get(year)
+        if _is_fresh(year, entry):
+            return entry
+        calendar = None if entry is not None else _stored_calendar(year)
+        if calendar is None:
+            calendar = _fetch_calendar(year)
+            race_store.save_season_table(year, CALENDAR_TABLE, calendar)
+        entry = {
+            'calendar': calendar,
+            'by_name': {name: (round_nr, event_name) for name, round_nr, event_name
+                        in zip(calendar['CustomEventName'], calendar['RoundNumber'], calendar['EventName'])},
+            'built': time.time(),
+        }
+        _index[year] = entry
+        return entry
+
+
+def get_calendar(year: int):
+    """
+    Gibt den Rennkalender einer Saison aus dem Kalender-Index zurück. Der Kalender wird pro Saison einmal aufgebaut und
+    im Race Store abgelegt, nur die laufende Saison wird regelmässig neu geladen. Es werden nur Rennen zurückgegeben,
+    die bereits stattgefunden haben.
+    Parameter: year
+    Return: calendar
+    """
+    calendar = _season_entry(year)['calendar']
+    return calendar[calendar['EventDate'] < pd.to_datetime(date.today())]
+
+
+def lookup_race(year: int, race_str: str):
+    """
+    Gibt Rundennummer und Eventname zu einem Anzeigenamen aus dem Kalender zurück (Lookup in einem Dictionary).
+    Nach dem Neuladen der laufenden Saison kann ein zuvor gewählter Name fehlen, dann wird None zurückgegeben.
+    Parameter: year, race_str (CustomEventName)
+    Return: (race_nr, race_name) oder None
+    """
+    return _season_entry(year)['by_name'].get(race_str)
+
+
+def build_calendar_index(seasons=SEASONS):
+    """
+    Baut den Kalender-Index für alle Saisons auf (z.B. beim Start des Servers), danach lösen Widgets keine
+    Kalenderabfragen mehr aus.
+    Parameter: seasons
+    Return: None
+    """
+    for year in seasons:
+        _season_entry(year)
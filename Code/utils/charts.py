@@ -0,0 +1,384 @@
+import matplotlib as mpl
+import matplotlib.patches as mpatches
+import matplotlib.ticker as ticker
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+from matplotlib.legend_handler import HandlerPatch
+
+from utils.app_init import lazy_import, setup_plotting
+from utils.stints import stint_trend
+from utils.telemetry import TRACK_MAP_POINTS, downsample_track, resample_telemetry
+
+#seaborn (with scipy) is only needed for the lap times scatter, it is loaded on the first call
+sns = lazy_import('seaborn')
+
+#color scheme of fastf1, once per process when the first matplotlib figure is about to be drawn
+setup_plotting()
+
+# Define your custom diverging colormap (e.g., green for one driver, orange for the other)
+custom_cmap = LinearSegmentedColormap.from_list(
+    "custom_diff", ["green", "white", "#633a34"]
+)
+
+
+class HandlerCircle(HandlerPatch):
+    def create_artists(self, legend, orig_handle,
+                       xdescent, ydescent, width, height, fontsize, trans):
+        radius = min(width, height) / 2
+        center = [xdescent + width / 2, ydescent + height / 2]
+        circle = mpatches.Circle(center, radius)  # 👈 use mpatches.Circle here
+        self.update_prop(circle, orig_handle, legend)
+        circle.set_transform(trans)
+        return [circle]
+
+
+def _format_laptime(timedelta_obj):
+    total_seconds = timedelta_obj.total_seconds()
+    minutes = int(total_seconds // 60)
+    seconds = int(total_seconds % 60)
+    milliseconds = int((total_seconds - int(total_seconds)) * 1000)
+    return f"{minutes}:{seconds:02d}.{milliseconds:03d}"
+
+
+#y labels are complicated because streamlit doesnt work well with original time formats
+def _format_laptime_axis(x, pos):
+    mins = int(x // 60)
+    secs = int(x % 60)
+    return f"{mins}:{secs:02d}"
+
+
+def build_speed_figure(fastest, driver_info, drivers, year, race_name, max_points: int = TRACK_MAP_POINTS):
+    """
+    Erstellt die Grafik der Page Geschwindigkeit: die schnellsten Runden zweier Fahrer eingefärbt nach Geschwindigkeit
+    und darunter der Vergleich, wer wo auf der Strecke schneller war. Jede Streckenlinie wird mit downsample_track auf
+    höchstens max_points Punkte reduziert.
+    Parameter: fastest (Telemetrie der schnellsten Runden), driver_info, drivers (2 Abkürzungen), year, race_name,
+               max_points
+    Return: fig
+    """
+    # Set up figure and grid layout, the constrained layout also places the two colorbars
+    fig = Figure(figsize=(10, 14.5), layout='constrained')  # Tall layout to allow space for three rows
+    gs = fig.add_gridspec(nrows=2, ncols=2, height_ratios=[1, 1.6])
+
+    # Define axes for top two driver plots
+    axes = [fig.add_subplot(gs[0, 0]), fig.add_subplot(gs[0, 1])]
+    ax_bottom = fig.add_subplot(gs[1, :])  # Placeholder for third plot (full-width)
+
+    # Collect all speeds for global color normalization
+    all_speeds = [fastest[driver]['telemetry']['Speed'] for driver in drivers]
+
+    # Normalize speeds globally for consistent coloring
+    all_speeds_combined = np.concatenate(all_speeds)
+    norm = mpl.colors.Normalize(all_speeds_combined.min(), all_speeds_combined.max())
+
+    # Plotting top two driver laps
+    for i, driver in enumerate(drivers):
+        ax = axes[i]
+        #shape preserving subset of the samples, corners and speed extremes stay, straights get fewer segments
+        telemetry = downsample_track(fastest[driver]['telemetry'], max_points)
+        x = telemetry['X']
+        y = telemetry['Y']
+        color = telemetry['Speed']
+
+        points = np.array([x, y]).T.reshape(-1, 1, 2)
+        segments = np.concatenate([points[:-1], points[1:]], axis=1)
+
+        lc = LineCollection(segments, cmap='plasma', norm=norm, linewidth=7)
+        lc.set_array(color)
+
+        ax.plot(x, y, color='black', linestyle='-', linewidth=12, zorder=0)
+        ax.add_collection(lc)
+
+        # Driver name for title
+        d_name = driver_info.loc[driver_info['Abbreviation'] == driver, 'FullName'].values[0]
+        d_team = driver_info.loc[driver_info['Abbreviation'] == driver, 'TeamName'].values[0]
+        d_laptime = _format_laptime(fastest[driver]['lap_time'])
+        ax.set_title(f'{d_name}, {d_team}\nRundenzeit: {d_laptime}', fontsize=14)
+        ax.set_aspect('equal', adjustable='box')
+        ax.axis('off')
+
+    # Add a colorbar above the top plots
+    sm = mpl.cm.ScalarMappable(norm=norm, cmap='plasma')
+    fig.colorbar(sm, ax=axes, location='top', orientation='horizontal', shrink=0.5, aspect=30,
+                 label='Geschwindigkeit (km/h)')
+
+    # Add a figure-level title
+    fig.suptitle(f'{year} {race_name}\nVergleich der schnellsten Runden zweier Fahrer im Rennen', fontsize=18)
+
+    # Resample all selected drivers onto a common distance base in one go (drivers x points x channels), dense enough
+    # for the difference, the drawn line is downsampled afterwards
+    num_points = 1000
+    dist_common, resampled = resample_telemetry([fastest[driver]['telemetry'] for driver in drivers],
+                                                channels=['X', 'Y', 'Speed'], num_points=num_points)
+    x_all, y_all, speed_all = resampled[:, :, 0], resampled[:, :, 1], resampled[:, :, 2]
+
+    # Average position between the drivers (to draw segments)
+    x_avg = x_all.mean(axis=0)
+    y_avg = y_all.mean(axis=0)
+
+    # Speed difference (positive = driver 1 faster, negative = driver 2 faster)
+    speed_diff = speed_all[0] - speed_all[1]
+
+    comparison = downsample_track(pd.DataFrame({'X': x_avg, 'Y': y_avg, 'SpeedDiff': speed_diff}), max_points,
+                                  color_channel='SpeedDiff')
+    x_avg, y_avg, speed_diff = (comparison[c].to_numpy() for c in ('X', 'Y', 'SpeedDiff'))
+
+    # Build segments for line collection
+    points = np.array([x_avg, y_avg]).T.reshape(-1, 1, 2)
+    segments = np.concatenate([points[:-1], points[1:]], axis=1)
+
+    # Diverging norm around 0 for the speed difference
+    diff_norm = mpl.colors.TwoSlopeNorm(vmin=-20, vcenter=0, vmax=20)  # adjust limits as needed
+
+    lc = LineCollection(segments, cmap=custom_cmap, norm=diff_norm, linewidth=6)
+    lc.set_array(speed_diff[:-1])  # one value per segment
+
+    # Plot on ax_bottom
+    ax_bottom.add_collection(lc)
+    ax_bottom.plot(x_avg, y_avg, color='black', linewidth=12, zorder=0)
+    ax_bottom.set_aspect('equal')
+    ax_bottom.set_title("Vergleich auf der Runde: Wer war wo schneller? (in km/h)", fontsize=14)
+    ax_bottom.axis('off')
+
+    # Colorbar for difference
+    fig.colorbar(mpl.cm.ScalarMappable(norm=diff_norm, cmap=custom_cmap), ax=ax_bottom, location='bottom',
+                 orientation='horizontal', shrink=0.5, aspect=30,
+                 label=f"{drivers[1]} schneller        ←        →        {drivers[0]} schneller")
+    return fig
+
+
+def build_position_figure(race, drivers_abbr, y_axis_metric, race_name):
+    """
+    Erstellt die Grafik der Page Positionsverlauf: Position oder Zeitabstand aller Fahrer pro Runde, ausgewählte Fahrer
+    hervorgehoben (ohne Auswahl alle in Teamfarben), darüber Regen- und Safety-Car-Runden.
+    Parameter: race (RaceData), drivers_abbr, y_axis_metric, race_name
+    Return: fig
+    """
+    laps, driver_info, year = race.laps, race.driver_info, race.year
+
+    #calculate laps where it was raining for any driver
+    rain_laps = sorted(laps[laps["Raining"]]["LapNumber"].unique())
+
+    #same for saftey car laps
+    sc_laps = sorted(laps[laps["TrackStatus"].isin(["4", "6"])]["LapNumber"].unique())
+
+    #Vizualize (inspired by example from fastf1 documentation)
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+
+    for drv in driver_info['DriverNumber']:
+        drv_laps = laps.pick_drivers(drv)
+        #classified drivers without laps (DNS) have no line
+        if drv_laps.empty:
+            continue
+        abb = drv_laps['Driver'].iloc[0]
+
+        if not drivers_abbr:
+            # No selection, all drivers in their own style
+            style = race.driver_style(abb)
+            line_kws = {}
+        elif abb in drivers_abbr:
+            # Highlight selected
+            style = race.driver_style(abb)
+            line_kws = {'alpha': 1.0, 'linewidth': 2.0}
+        else:
+            # Fade others
+            style = {'color': 'lightgray', 'linestyle': '--'}
+            line_kws = {'alpha': 0.5, 'linewidth': 1.0}
+
+        # Determine y-values
+        if y_axis_metric == "TimeBehindLeaderSeconds":
+            y_vals = drv_laps["TimeBehindLeaderSeconds"]
+        else:
+            y_vals = drv_laps["Position"]
+
+        ax.plot(drv_laps['LapNumber'], y_vals, label=abb, **style, **line_kws)
+
+    #add top overlay axis for rain/SC indicators
+    ax_top = ax.inset_axes([0, 1.00, 1, 0.04], sharex=ax)
+    ax_top.axis('off')
+
+    # Plot rain and SC boxes
+    for lap in rain_laps:
+        ax_top.axvspan(lap - 0.5, lap + 0.5, ymin=0.5, ymax=1, color='deepskyblue', alpha=0.7)
+
+    for lap in sc_laps:
+        ax_top.axvspan(lap - 0.5, lap + 0.5, ymin=0, ymax=0.5, color='darkorange', alpha=0.7)
+
+    #set ax properties and titles
+    fig.suptitle(f"Positionsverlauf, {year} {race_name}", fontsize=16, fontweight='bold', y = 1.03)
+
+    if y_axis_metric == "Position":
+        ax.set_ylim([20.5, 0.5])
+        ax.set_yticks([1, 5, 10, 15, 20])
+        ax.set_ylabel('Position')
+    else:
+        ax.set_ylim(bottom=-5)
+        ax.invert_yaxis()
+        ax.set_ylabel('Zeit hinter Führendem (Sekunden)')
+
+    ax.set_xlabel('Runde')
+    ax.legend(bbox_to_anchor=(1.0, 1.02))
+
+    #add legend
+    rain_patch = mpatches.Patch(color='deepskyblue', label='REGEN')
+    sc_patch = mpatches.Patch(color='darkorange', label='SAFETY CAR / VSC')
+
+    context_legend = fig.legend(
+        handles=[rain_patch, sc_patch], loc='upper center', bbox_to_anchor=(0.5, 0.98),
+        ncol=2, frameon=False, fontsize='medium', title_fontsize='large', columnspacing=1.5
+    )
+    fig.add_artist(context_legend)
+
+    fig.tight_layout()
+    return fig
+
+
+def build_lap_times_figure(race, drivers_abbr, hide_pit_laps, race_name, show_trends: bool = False):
+    """
+    Erstellt die Grafik der Page Rundenzeiten: pro Fahrer (2 oder 4) die Rundenzeiten eingefärbt nach Reifentyp mit
+    Regen-, Safety-Car- und Boxenstopp-Markierungen, optional mit der Trendlinie des Reifenabbaus pro Stint.
+    Parameter: race (RaceData), drivers_abbr, hide_pit_laps ("Ja"/"Nein"), race_name, show_trends
+    Return: fig
+    """
+    laps, driver_info, year = race.laps, race.driver_info, race.year
+
+    #calc number of rows need in viz based on drivers_amount
+    rows = 1 if len(drivers_abbr) == 2 else 2
+
+    #compound color mapping and add gray just in case (missing tyre values seen in 2018 data)
+    compound_palette = race.compound_colors()
+    compound_palette['NODATA'] = '#808080'
+
+    #create 2x2 subplot layout
+    fig = Figure(figsize=(16, 8*rows))
+    axes = fig.subplots(rows, 2, sharey=True)
+    axes = axes.flatten()
+
+    #loop to plot each driver
+    for i, driver in enumerate(drivers_abbr):
+        ax = axes[i]
+        driver_laps = laps[laps['Driver'] == driver].copy()
+
+        #Finde Boxenstopp-Runden für mögliche Ausblendung
+        pit_laps = driver_laps[
+            driver_laps['PitInTime'].notna() | driver_laps['PitOutTime'].notna()
+            ]['LapNumber'].drop_duplicates()
+
+        #Diese exkludieren je nach Inputbox
+        if hide_pit_laps == "Ja":
+            driver_laps.loc[driver_laps['LapNumber'].isin(pit_laps), 'LapTimeSeconds'] = np.nan
+
+        sns.scatterplot(data=driver_laps, x="LapNumber", y="LapTimeSeconds", hue="Compound",
+                        palette=compound_palette, ax=ax, s=100, linewidth=0, legend=False)
+
+        #fuel corrected degradation trend per stint, from the precomputed stint table
+        if show_trends:
+            stints = race.stints()
+            total_laps = laps['LapNumber'].max()
+            for _, stint in stints[(stints['Driver'] == driver) & stints['Degradation'].notna()].iterrows():
+                lap_numbers, lap_times = stint_trend(stint, total_laps)
+                ax.plot(lap_numbers, lap_times, color=compound_palette.get(stint['Compound'], 'black'),
+                        linestyle='--', linewidth=2, zorder=3)
+                ax.annotate(f"{stint['Degradation']:+.3f} s/Runde", (lap_numbers[-1], lap_times[-1]),
+                            textcoords='offset points', xytext=(-4, -14), ha='right', fontsize=11)
+
+        #Rain Laps Squares
+        raining_laps = driver_laps[driver_laps['Raining'] == True]['LapNumber']
+        for lap in raining_laps:
+            ax.axvspan(lap - 0.5, lap + 0.5, ymin=0.98, ymax=1.0, color='deepskyblue', alpha=0.7)
+
+        #Safety Car Laps Squares
+        sc_laps = driver_laps[driver_laps['TrackStatus'].isin(['4', '6'])]['LapNumber']
+        for lap in sc_laps:
+            ax.axvspan(lap - 0.5, lap + 0.5, ymin=0.96, ymax=0.98, color='darkorange', alpha=0.7)
+
+        #Pit Stop Laps highlighted
+        pit_laps = driver_laps[driver_laps['PitInTime'].notna()]['LapNumber']
+        for lap in pit_laps:
+            ax.axvspan(lap - 0.5, lap + 1.5, color='lightgrey', alpha=0.2, zorder=0)
+
+        #Get Strings vor Viz
+        d_name = driver_info.loc[driver_info['Abbreviation'] == driver, 'FullName'].values[0]
+        d_team = driver_info.loc[driver_info['Abbreviation'] == driver, 'TeamName'].values[0]
+        d_pos = driver_info.loc[driver_info['Abbreviation'] == driver, 'ClassifiedPosition'].values[0]
+
+        #titles and more
+        ax.set_title(f"{d_name}, {d_team} (Rang: {d_pos})", fontsize=18)
+        ax.set_xlabel("Runde", fontsize=16)
+        ax.yaxis.set_major_formatter(ticker.FuncFormatter(_format_laptime_axis))
+
+        if i % 2 == 0:
+            ax.set_ylabel("Rundenzeit (Min.)", fontsize=16)
+
+        ax.set_xlim(left=0)
+        ax.tick_params(axis='both', labelsize=14)
+        ax.invert_yaxis()
+        ax.grid(alpha=0.3)
+
+    #Identify all compounds actually used in the laps data
+    used_compounds = laps['Compound'].dropna().unique()
+
+    handles = [
+        mpatches.Patch(color=compound_palette[compound], label=compound)
+        for compound in used_compounds if compound in compound_palette
+    ]
+
+    compound_legend = fig.legend(
+        handles, [h.get_label() for h in handles],
+        title="Reifentyp", loc='lower center', bbox_to_anchor=(0.3, -0.01),
+        ncol=len(handles), frameon=False,
+        fontsize='large', title_fontsize='x-large',
+        handletextpad=0.8, columnspacing=1.5, handlelength=1.5,
+        handler_map={mpatches.Patch: HandlerCircle()}
+    )
+
+    #Custom Legend 2 - Context Information
+    rain_patch = mpatches.Patch(color='deepskyblue', label='REGEN')
+    sc_patch = mpatches.Patch(color='darkorange', label='SAFETY CAR / VSC')
+    pit_patch = mpatches.Patch(color='lightgrey', alpha=0.5, label='BOXENSTOPP')
+
+    context_legend = fig.legend(handles=[rain_patch, sc_patch, pit_patch],
+                                title="Kontextinformationen", loc='lower center', bbox_to_anchor=(0.73, -0.01), ncol=3, frameon=False,
+                                fontsize='large', title_fontsize='x-large', columnspacing=1.5)
+
+    fig.add_artist(compound_legend)
+    fig.add_artist(context_legend)
+
+    #Title
+    fig.suptitle(f"{year} {race_name} – Vergleich der Rundenzeiten nach Fahrer", fontsize=24)
+
+    #Adjusted Layout for Title and Legends
+    fig.tight_layout(rect=[0, 0.045, 1, 0.98])
+    return fig
+
+
+def build_points_figure(drivers, driver_series, highlight_drivers, year):
+    """
+    Erstellt die Grafik der Page Punkte: kumulierte Punkte aller Fahrer über die Saison, ausgewählte Fahrer hervorgehoben.
+    Parameter: drivers (nach Punkten sortiert, mit TeamColor), driver_series, highlight_drivers, year
+    Return: fig
+    """
+    # Plot-Setup
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+
+    # Driver sorted by points
+    for driver, color in drivers["TeamColor"].items():
+        group = driver_series[driver]
+
+        # Hihglight Driver when selected
+        if not highlight_drivers or driver in highlight_drivers:
+            ax.plot(group["RoundNumber"], group["CumulativePoints"], label=driver, color=color, linewidth=2.5)
+        else:
+            ax.plot(group["RoundNumber"], group["CumulativePoints"], label=driver, color=color, alpha=0.2, linewidth=1.0)
+
+    ax.set_title(f"Total Punkte der Fahrer – Saison {year}")
+    ax.set_xlabel("Rennen")
+    ax.set_ylabel("Total Punkte")
+    ax.legend(loc='upper left', bbox_to_anchor=(1, 1), title="Fahrer (nach Punkten)")
+    ax.grid(True, linestyle='--', alpha=0.5)
+    return fig
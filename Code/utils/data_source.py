@@ -0,0 +1,257 @@
+import argparse
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import fastf1
+import fastf1._api
+import fastf1.core
+import fastf1.exceptions
+import pandas as pd
+
+from utils import race_store
+from utils.synthetic_data import (synthetic_race, synthetic_schedule, synthetic_fastest_laps, synthetic_event_name,
+                                  synthetic_car_data)
+
+#backend for sessions and schedules: 'fastf1' (live API) or 'local' (recorded races, otherwise synthetic data)
+DATA_SOURCE = os.environ.get('RACING_INSIGHTS_DATA_SOURCE', 'fastf1')
+
+#recorded races and schedules for the local backend
+RECORDINGS_DIR = Path(os.environ.get('RACING_INSIGHTS_RECORDINGS', race_store.STORE_DIR / 'recordings'))
+
+#local sessions currently answering the livetiming driver list, see _answer_driver_info
+_answering = {}
+_answering_lock = threading.Lock()
+_live_driver_info = None
+
+
+def _driver_info(path, *args, **kwargs):
+    session = _answering.get(path)
+    if session is not None:
+        return session.driver_info()
+    return _live_driver_info(path, *args, **kwargs)
+
+
+@contextmanager
+def _answer_driver_info(session):
+    #fastf1.plotting asks the livetiming API for the drivers of a session; only while a local session is used for
+    #plotting the request is answered locally, all other paths still go to the API. The hook is installed by the first
+    #and removed by the last of concurrent users, so overlapping calls don't restore it out of order.
+    global _live_driver_info
+    with _answering_lock:
+        if not _answering:
+            _live_driver_info = fastf1._api.driver_info
+            fastf1._api.driver_info = _driver_info
+        _answering[session.api_path] = session
+    try:
+        yield
+    finally:
+        with _answering_lock:
+            _answering.pop(session.api_path, None)
+            if not _answering:
+                fastf1._api.driver_info = _live_driver_info
+
+
+class Fastf1Source:
+    """
+    Datenquelle über die Live-API von fastf1 (Standard).
+    """
+
+    def get_session(self, year: int, race_nr: int):
+        return fastf1.get_session(year, race_nr, 'R')
+
+    def get_event_schedule(self, year: int):
+        return fastf1.get_event_schedule(year, include_testing=False)
+
+    def fastest_lap(self, session, driver: str):
+        #None for drivers without a valid fastest lap (e.g. retired on lap 1), as in the telemetry archive
+        lap = session.laps.pick_drivers(driver).pick_fastest()
+        if lap is None or pd.isna(lap['LapTime']):
+            return None
+        return lap.telemetry, lap['LapTime']
+
+
+class LocalSession:
+    """
+    Session der lokalen Datenquelle mit der gleichen Schnittstelle, wie sie die App von einer fastf1-Session braucht
+    (load, laps, results, weather_data, car_data, event, api_path). Die Daten kommen aus einer Aufnahme oder werden generiert.
+    """
+
+    def __init__(self, year: int, race_nr: int, recording=None):
+        self.api_path = f"/local/{year}/{race_nr:02d}/"
+        self.year = year
+        self.race_nr = race_nr
+        self._recording = recording
+        self._data = None
+        self._car_data = None
+        self._loaded = set()
+        event_name = recording['event']['EventName'] if recording else synthetic_event_name(race_nr)
+        event_date = recording['event']['EventDate'] if recording else \
+            synthetic_schedule(year)['EventDate'].iloc[race_nr - 1]
+        self.event = pd.Series({'EventName': event_name, 'EventDate': event_date, 'RoundNumber': race_nr})
+
+    def _race(self):
+        if self._data is None:
+            if self._recording is not None:
+                self._data = (self._recording['laps'], self._recording['results'], self._recording['weather_data'])
+            else:
+                self._data = synthetic_race(self.year, self.race_nr)
+        return self._data
+
+    def load(self, laps: bool = True, telemetry: bool = True, weather: bool = True, messages: bool = True):
+        #results are always part of a load, like in fastf1
+        self._loaded.add('results')
+        if laps:
+            self._loaded.add('laps')
+        if weather:
+            self._loaded.add('weather')
+        if telemetry:
+            self._loaded.add('telemetry')
+
+    def _require(self, part: str):
+        if part not in self._loaded:
+            raise fastf1.exceptions.DataNotLoadedError("The data you are trying to access has not been loaded yet.")
+
+    @property
+    def results(self):
+        self._require('results')
+        return self._race()[1]
+
+    @property
+    def drivers(self):
+        return list(self.results['DriverNumber'])
+
+    @property
+    def laps(self):
+        self._require('laps')
+        return fastf1.core.Laps(self._race()[0])
+
+    @property
+    def weather_data(self):
+        self._require('weather')
+        return self._race()[2]
+
+    @property
+    def car_data(self):
+        #recordings only hold laps, so the car data of every session follows the laps on the synthetic track
+        self._require('telemetry')
+        if self._car_data is None:
+            self._car_data = synthetic_car_data(self._race()[0], seed=self.year * 100 + self.race_nr)
+        return self._car_data
+
+    def fastest_lap(self, driver: str):
+        self._require('telemetry')
+        if self._recording is not None:
+            return self._recording['fastest'].get(driver)
+        fastest = synthetic_fastest_laps([driver], seed=self.year * 100 + self.race_nr)[driver]
+        return fastest['telemetry'], fastest['lap_time']
+
+    def driver_info(self):
+        #answer to the livetiming driver list that fastf1.plotting uses for driver colors
+        results = self._race()[1]
+        return {number: {'RacingNumber': number, 'Tla': abbreviation, 'FirstName': first_name,
+                         'LastName': last_name, 'TeamName': team, 'TeamColour': color}
+                for number, abbreviation, first_name, last_name, team, color
+                in zip(results['DriverNumber'], results['Abbreviation'], results['FirstName'],
+                       results['LastName'], results['TeamName'], results['TeamColor'])}
+
+
+class LocalSource:
+    """
+    Lokale Datenquelle ohne Netzwerk: aufgenommene Rennen aus recordings_dir, alle anderen werden synthetisch erzeugt
+    (siehe synthetic_data.py). Gedacht für Lasttests, Benchmarks und Entwicklung ohne API.
+    """
+
+    def __init__(self, recordings_dir=RECORDINGS_DIR):
+        self.recordings_dir = recordings_dir
+
+    def _recording(self, *parts):
+        if self.recordings_dir is None:
+            return None
+        path = Path(self.recordings_dir).joinpath(*parts)
+        return pd.read_pickle(path) if path.exists() else None
+
+    def get_session(self, year: int, race_nr: int):
+        return LocalSession(int(year), int(race_nr), self._recording(str(year), f"{int(race_nr):02d}.pkl"))
+
+    def get_event_schedule(self, year: int):
+        schedule = self._recording(str(year), 'schedule.pkl')
+        return schedule if schedule is not None else synthetic_schedule(year)
+
+    def fastest_lap(self, session, driver: str):
+        return session.fastest_lap(driver)
+
+
+def plotting_context(session):
+    """
+    Gibt den Context Manager für Aufrufe von fastf1.plotting mit einer Session zurück: fastf1 fragt dabei die Fahrerliste
+    der Session bei der Live-API ab, für lokale Sessions wird sie nur innerhalb dieses Context Managers lokal
+    beantwortet, ohne fastf1 für den ganzen Prozess zu verändern.
+    Parameter: session
+    Return: Context Manager
+    """
+    if isinstance(session, LocalSession):
+        return _answer_driver_info(session)
+    return nullcontext()
+
+
+_SOURCES = {'fastf1': Fastf1Source, 'local': LocalSource}
+
+#one data source per process, used by load_data, the calendar index and the telemetry
+source = _SOURCES[DATA_SOURCE]()
+
+
+def record_race(year: int, race_nr: int, recordings_dir=RECORDINGS_DIR):
+    """
+    Nimmt ein Rennen über die Live-API auf (Runden, Resultate, Wetter und schnellste Runde jedes Fahrers), damit die
+    lokale Datenquelle es später ohne Netzwerk abspielen kann.
+    Parameter: year, race_nr, recordings_dir
+    Return: None
+    """
+    live = Fastf1Source()
+    session = live.get_session(year, race_nr)
+    session.load()
+
+    fastest = {}
+    for driver in session.results['Abbreviation']:
+        lap = live.fastest_lap(session, driver)
+        #drivers without a valid fastest lap (e.g. retired on lap 1) are simply missing, as in the archive
+        if lap is None:
+            continue
+        telemetry, lap_time = lap
+        fastest[driver] = (pd.DataFrame(telemetry).reset_index(drop=True), lap_time)
+
+    recording = {
+        'event': {'EventName': session.event['EventName'], 'EventDate': session.event['EventDate']},
+        'laps': pd.DataFrame(session.laps),
+        'results': pd.DataFrame(session.results),
+        'weather_data': pd.DataFrame(session.weather_data),
+        'fastest': fastest,
+    }
+    path = Path(recordings_dir) / str(year) / f"{int(race_nr):02d}.pkl"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    race_store.write_atomic(path, lambda p: pd.to_pickle(recording, p))
+
+
+def record_schedule(year: int, recordings_dir=RECORDINGS_DIR):
+    """
+    Nimmt den Rennkalender einer Saison über die Live-API auf.
+    Parameter: year, recordings_dir
+    Return: None
+    """
+    schedule = pd.DataFrame(Fastf1Source().get_event_schedule(year))
+    path = Path(recordings_dir) / str(year) / 'schedule.pkl'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    race_store.write_atomic(path, lambda p: schedule.to_pickle(p))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Nimmt Rennen für die lokale Datenquelle auf.")
+    parser.add_argument('year', type=int)
+    parser.add_argument('rounds', type=int, nargs='+')
+    args = parser.parse_args()
+    record_schedule(args.year)
+    for race_nr in args.rounds:
+        record_race(args.year, race_nr)
+        print(f"{args.year} Rennen {race_nr} aufgenommen")
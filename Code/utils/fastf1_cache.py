@@ -0,0 +1,283 @@
+import inspect
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+import fastf1
+import numpy as np
+import pyarrow as pa
+from fastf1.req import Cache
+
+try:
+    import fcntl
+except ImportError:
+    #no file locks on windows, the index is then only protected within one process
+    fcntl = None
+
+from utils import race_store
+
+#shared location of the fastf1 cache, next to the race store by default so restarts and replicas on the same volume
+#find the raw data on local disk
+CACHE_DIR = Path(os.environ.get('RACING_INSIGHTS_FASTF1_CACHE', race_store.STORE_DIR / 'fastf1_cache'))
+
+#size budget of the whole cache directory (parsed data of fastf1 and its http cache)
+CACHE_BUDGET_MB = float(os.environ.get('RACING_INSIGHTS_FASTF1_CACHE_MB', 4096))
+
+#the http cache of fastf1 (one sqlite file for all seasons) can't be evicted per season, it has its own share of the
+#budget; above it the responses closest to expiry are deleted
+HTTP_CACHE_BUDGET_MB = float(os.environ.get('RACING_INSIGHTS_HTTP_CACHE_MB', CACHE_BUDGET_MB / 8))
+
+#seasons used more recently than this are never compressed or evicted (another replica may be loading them)
+MIN_IDLE_SECONDS = 3600
+
+#last use per season, shared by all processes on the cache directory (read-modify-write under a file lock)
+INDEX_FILE = 'seasons.json'
+INDEX_LOCK_FILE = 'seasons.lock'
+
+#enforce_budget runs after every load, the cache directory is walked at most once per interval
+SIZE_CHECK_SECONDS = 60
+
+_COMPRESSED_SUFFIX = '.zst'
+
+logger = logging.getLogger(__name__)
+
+_stats = Counter()
+_lock = threading.Lock()
+_index_lock = threading.Lock()
+#time and result of the last walk over the cache directory
+_last_size = None
+#one budget run at a time per process, concurrent loads skip it instead of compressing the same season twice
+_budget_lock = threading.Lock()
+_configured = False
+
+
+def _count_lookups(get_cache_file_path):
+    #fastf1 checks for the returned file right after this call, so its existence decides hit or miss
+    def counted(cls, api_path, name):
+        path = get_cache_file_path(cls, api_path, name)
+        with _lock:
+            _stats['hits' if os.path.isfile(path) else 'misses'] += 1
+        return path
+    return classmethod(counted)
+
+
+def configure_cache():
+    """
+    Aktiviert den fastf1-Cache einmal pro Prozess im gemeinsamen Ordner CACHE_DIR, zählt Treffer und Fehlschläge und
+    hält das Budget ein. Wird beim Import von helper_functions aufgerufen, weitere Aufrufe tun nichts.
+    Parameter: -
+    Return: None
+    """
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        Cache.enable_cache(str(CACHE_DIR))
+        #private hook of fastf1, without it the cache works as usual but hits and misses aren't counted
+        if isinstance(inspect.getattr_static(Cache, '_get_cache_file_path', None), classmethod):
+            Cache._get_cache_file_path = _count_lookups(Cache._get_cache_file_path.__func__)
+        else:
+            logger.warning("fastf1 cache: Cache._get_cache_file_path not found in fastf1 %s, hits and misses are not "
+                           "counted", fastf1.__version__)
+        _configured = True
+    enforce_budget()
+
+
+def _read_index():
+    path = CACHE_DIR / INDEX_FILE
+    try:
+        return {int(year): last_used for year, last_used in json.loads(path.read_text()).items()}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_index(index):
+    race_store.write_atomic(CACHE_DIR / INDEX_FILE, lambda p: p.write_text(json.dumps(index)))
+
+
+@contextmanager
+def _locked_index():
+    #threads of this process and other processes (workers, replicas) update the index one after another
+    with _index_lock, open(CACHE_DIR / INDEX_LOCK_FILE, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _season_dirs():
+    return {int(path.name): path for path in CACHE_DIR.iterdir() if path.is_dir() and path.name.isdigit()}
+
+
+def _size(path: Path):
+    if path.is_file():
+        return path.stat().st_size
+    return sum(file.stat().st_size for file in path.rglob('*') if file.is_file())
+
+
+def _cache_size():
+    #size of the whole cache directory, walked again only after SIZE_CHECK_SECONDS
+    global _last_size
+    if _last_size is None or time.time() - _last_size[0] > SIZE_CHECK_SECONDS:
+        _last_size = (time.time(), _size(CACHE_DIR))
+    return _last_size[1]
+
+
+def _compress_season(path: Path):
+    #fastf1 reads its pickles directly, so only idle seasons are compressed and restored before the next use
+    for file in path.rglob('*.ff1pkl'):
+
+        def write(tmp_path):
+            with pa.OSFile(str(file), 'rb') as source, pa.CompressedOutputStream(str(tmp_path), 'zstd') as target:
+                shutil.copyfileobj(source, target)
+
+        try:
+            race_store.write_atomic(Path(str(file) + _COMPRESSED_SUFFIX), write)
+            file.unlink()
+        except OSError:
+            #compressed by another process (e.g. a second worker) in the meantime
+            continue
+
+
+def _restore_season(path: Path):
+    for file in path.rglob('*.ff1pkl' + _COMPRESSED_SUFFIX):
+        target = Path(str(file)[:-len(_COMPRESSED_SUFFIX)])
+
+        def write(tmp_path):
+            with pa.CompressedInputStream(str(file), 'zstd') as source, open(tmp_path, 'wb') as out:
+                shutil.copyfileobj(source, out)
+
+        try:
+            race_store.write_atomic(target, write)
+            file.unlink()
+        except FileNotFoundError:
+            #restored by another process in the meantime
+            continue
+
+
+def use_season(year: int):
+    """
+    Markiert eine Saison als verwendet (LRU) und entpackt ihre komprimierten Einträge, bevor fastf1 sie liest.
+    Parameter: year
+    Return: None
+    """
+    with _locked_index():
+        index = _read_index()
+        index[int(year)] = time.time()
+        _write_index(index)
+    path = CACHE_DIR / str(int(year))
+    if path.is_dir() and any(path.rglob('*' + _COMPRESSED_SUFFIX)):
+        _restore_season(path)
+        with _lock:
+            _stats['restored_seasons'] += 1
+
+
+def enforce_budget(budget_mb: float = CACHE_BUDGET_MB):
+    """
+    Hält den Cache unter dem Budget: zuerst wird der HTTP-Cache, der nicht nach Saisons getrennt ist, auf seinen Anteil
+    HTTP_CACHE_BUDGET_MB gekürzt (abgelaufene, dann die als nächstes ablaufenden Antworten, danach VACUUM), dann werden
+    die am längsten nicht verwendeten Saisons komprimiert und erst wenn das nicht reicht ganz entfernt (LRU pro Saison).
+    Saisons, die in den letzten MIN_IDLE_SECONDS verwendet wurden, bleiben unangetastet.
+    Parameter: budget_mb
+    Return: Grösse des Caches in MB danach (None, falls gerade ein anderer Thread aufräumt)
+    """
+    if not _budget_lock.acquire(blocking=False):
+        return None
+    try:
+        return _enforce_budget(budget_mb * 1e6)
+    finally:
+        _budget_lock.release()
+
+
+def _http_cache_size(session):
+    return session.cache.responses.size() if session is not None else 0
+
+
+def _trim_http_cache(session, budget: float):
+    #deleting rows doesn't shrink the sqlite file, only VACUUM gives the space back
+    session.cache.delete(expired=True, vacuum=False)
+    responses = session.cache.responses
+    responses.vacuum()
+    size = responses.size()
+    if size > budget:
+        #remove the share of responses that is over the budget, those closest to expiry first
+        count = responses.count()
+        excess = int(np.ceil(count * (size - budget) / size))
+        keys = [response.cache_key for response in responses.sorted(key='expires', limit=excess)]
+        session.cache.delete(*keys, vacuum=False)
+        responses.vacuum()
+        with _lock:
+            _stats['http_trimmed'] += len(keys)
+        logger.info("fastf1 cache: %d http responses deleted", len(keys))
+
+
+def _enforce_budget(budget: float):
+    global _last_size
+    total = _cache_size()
+    if total <= budget:
+        return total / 1e6
+
+    session = Cache._requests_session_cached
+    if session is not None:
+        _trim_http_cache(session, HTTP_CACHE_BUDGET_MB * 1e6)
+        total = _size(CACHE_DIR)
+
+    index = _read_index()
+    idle = [(index.get(year, 0), year, path) for year, path in _season_dirs().items()
+            if time.time() - index.get(year, 0) > MIN_IDLE_SECONDS]
+    idle.sort()
+
+    for _, year, path in idle:
+        if total <= budget:
+            break
+        if any(path.rglob('*.ff1pkl')):
+            before = _size(path)
+            _compress_season(path)
+            total -= before - _size(path)
+            with _lock:
+                _stats['compressed_seasons'] += 1
+
+    for _, year, path in idle:
+        if total <= budget:
+            break
+        total -= _size(path)
+        shutil.rmtree(path, ignore_errors=True)
+        with _lock:
+            _stats['evicted_seasons'] += 1
+        logger.info("fastf1 cache: season %s evicted", year)
+
+    if total > budget:
+        active = [path for year, path in _season_dirs().items()
+                  if time.time() - index.get(year, 0) <= MIN_IDLE_SECONDS]
+        logger.warning("fastf1 cache: %.0f MB over the budget of %.0f MB (http cache %.0f MB, %d seasons in use with "
+                       "%.0f MB)", (total - budget) / 1e6, budget / 1e6, _http_cache_size(session) / 1e6,
+                       len(active), sum(_size(path) for path in active) / 1e6)
+    _last_size = (time.time(), total)
+    return total / 1e6
+
+
+def cache_stats():
+    """
+    Gibt Treffer und Fehlschläge des fastf1-Caches (geparste Daten) seit dem Start des Prozesses zurück, dazu die
+    Anzahl komprimierter, entpackter und entfernter Saisons und die aktuelle Grösse.
+    Parameter: -
+    Return: dict
+    """
+    with _lock:
+        stats = dict(_stats)
+    stats['size_mb'] = round(_cache_size() / 1e6, 1) if CACHE_DIR.exists() else 0.0
+    stats['budget_mb'] = CACHE_BUDGET_MB
+    stats['http_cache_mb'] = round(_http_cache_size(Cache._requests_session_cached) / 1e6, 1)
+    return stats
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    configure_cache()
+    print(json.dumps(cache_stats(), indent=1))
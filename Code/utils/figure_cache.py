@@ -0,0 +1,74 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from utils.app_init import lazy_import
+from utils.profiling import span
+
+#only loaded when a figure is actually rendered, cache hits don't need matplotlib
+plt = lazy_import('matplotlib.pyplot')
+
+#byte budget for all rendered figures of the process, can be changed with an environment variable
+FIGURE_CACHE_BYTES = int(os.environ.get('RACING_INSIGHTS_FIGURE_CACHE_MB', 128)) * 1024 * 1024
+
+
+class FigureCache:
+    """
+    LRU-Cache für fertig gerenderte Grafiken (PNG/SVG-Bytes) mit einem Budget in Bytes. Wird das Budget überschritten,
+    werden die am längsten nicht mehr verwendeten Grafiken entfernt.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, data: bytes):
+        with self._lock:
+            if key in self._entries:
+                self.size_bytes -= len(self._entries.pop(key))
+            #figures larger than the whole budget are not kept at all
+            if len(data) > self.max_bytes:
+                return
+            self._entries[key] = data
+            self.size_bytes += len(data)
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'size_bytes': self.size_bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+#one cache per process, shared by all pages and sessions
+figure_cache = FigureCache(FIGURE_CACHE_BYTES)
+
+
+def render_figure(fig, fmt: str = 'png', close: bool = True):
+    """
+    Rendert eine matplotlib-Grafik mit den gleichen Einstellungen wie st.pyplot zu Bytes und schliesst sie danach.
+    Parameter: fig, fmt ('png' oder 'svg'), close (False, um dieselbe Grafik noch in einem weiteren Format zu rendern)
+    Return: bytes
+    """
+    buffer = io.BytesIO()
+    with span('figure.render', fmt=fmt):
+        fig.savefig(buffer, format=fmt, bbox_inches='tight', dpi=200)
+    if close:
+        plt.close(fig)
+    return buffer.getvalue()
+
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+#name of the race table in the race store, computed once per race on first use
+GAPS_TABLE = 'gaps'
+
+#resolution of the gap engine: checkpoints per lap along the race distance
+MINI_SECTORS_PER_LAP = 25
+
+
+def race_progress(car_data, laps):
+    """
+    Berechnet für jeden Fahrer, wie weit er zu jedem Sample der Fahrzeugdaten im Rennen ist (in Runden). Die Distanz
+    wird aus der Geschwindigkeit integriert und an den Zieldurchfahrten aus laps verankert, so summiert sich der Fehler
+    der Integration nicht über das Rennen. Samples vor dem Start und nach der letzten gewerteten Runde fallen weg.
+    Parameter: car_data (dict DriverNumber -> DataFrame mit SessionTime und Speed), laps (bereinigt)
+    Return: dict Driver -> (seconds, progress), nur Fahrer mit mindestens zwei Samples
+    """
+    tracks = {}
+    for (number, driver), driver_laps in laps.groupby(['DriverNumber', 'Driver'], observed=True, sort=False):
+        driver_laps = driver_laps.dropna(subset=['Time']).sort_values('LapNumber')
+        if driver_laps.empty or str(number) not in car_data:
+            continue
+        samples = car_data[str(number)]
+        seconds = samples['SessionTime'].dt.total_seconds().to_numpy()
+        distance = np.concatenate([[0], np.cumsum(samples['Speed'].to_numpy(dtype=float)[:-1] / 3.6
+                                                  * np.diff(seconds))])
+
+        #anchors: start of the first lap and every crossing of the line, with the laps completed at that point
+        first = driver_laps.iloc[0]
+        anchor_seconds = np.concatenate([[first['LapStartTime'].total_seconds()],
+                                         driver_laps['Time'].dt.total_seconds().to_numpy()])
+        anchor_laps = np.concatenate([[first['LapNumber'] - 1], driver_laps['LapNumber'].to_numpy(dtype=float)])
+        valid = ~np.isnan(anchor_seconds)
+        anchor_seconds, anchor_laps = anchor_seconds[valid], anchor_laps[valid]
+        if len(anchor_seconds) < 2:
+            continue
+
+        inside = (seconds >= anchor_seconds[0]) & (seconds <= anchor_seconds[-1])
+        anchor_distance = np.interp(anchor_seconds, seconds, distance)
+        progress = np.interp(distance[inside], anchor_distance, anchor_laps)
+        #a track needs two samples to interpolate (e.g. a retiree on lap 1 without LapStartTime has none)
+        if len(progress) < 2:
+            continue
+        tracks[driver] = (seconds[inside], progress)
+    return tracks
+
+
+def crossing_times(tracks, checkpoints):
+    """
+    Gibt für alle Fahrer und Checkpoints die Session-Zeit zurück, zu der der Fahrer den Checkpoint erreicht hat, in
+    einer einzigen Interpolation über alle Fahrer (wie resample_telemetry, aber ohne Extrapolation: nicht erreichte
+    Checkpoints sind NaN).
+    Parameter: tracks (dict Driver -> (seconds, progress), progress aufsteigend), checkpoints (in Runden, aufsteigend)
+    Return: times (Fahrer x Checkpoints)
+    """
+    progress = [track[1] for track in tracks.values()]
+    lengths = np.array([len(p) for p in progress])
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    #shift every driver by its own offset on one sorted axis, one searchsorted finds all segments
+    offset_step = checkpoints[-1] + 2.0
+    offsets = np.arange(len(progress)) * offset_step
+    flat_progress = np.concatenate([p + o for p, o in zip(progress, offsets)])
+    flat_seconds = np.concatenate([track[0] for track in tracks.values()])
+    grid = checkpoints[None, :] + offsets[:, None]
+
+    right = np.searchsorted(flat_progress, grid, side='left')
+    right = np.clip(right, starts[:, None] + 1, (starts + lengths - 1)[:, None])
+    left = right - 1
+
+    step = flat_progress[right] - flat_progress[left]
+    weight = np.divide(grid - flat_progress[left], step, out=np.zeros_like(grid), where=step != 0)
+    times = flat_seconds[left] + weight * (flat_seconds[right] - flat_seconds[left])
+
+    reached = (grid >= flat_progress[starts][:, None]) & (grid <= flat_progress[starts + lengths - 1][:, None])
+    return np.where(reached, times, np.nan)
+
+
+def compute_gaps(car_data, laps, mini_sectors_per_lap: int = MINI_SECTORS_PER_LAP):
+    """
+    Berechnet für das ganze Rennen an jedem Minisektor den Zeitabstand jedes Fahrers zum Führenden und zum Vordermann
+    an derselben Stelle der Renndistanz. Nach race_progress laufen alle Fahrer und Checkpoints als eine
+    Array-Berechnung (Fahrer x Checkpoints).
+    Parameter: car_data (dict DriverNumber -> DataFrame mit SessionTime und Speed), laps (bereinigt),
+               mini_sectors_per_lap
+    Return: gaps (DataFrame mit Driver, Progress, GapToLeader, GapToAhead)
+    """
+    tracks = race_progress(car_data, laps)
+    n_laps = int(max((track[1][-1] for track in tracks.values()), default=0))
+    if n_laps == 0:
+        return pd.DataFrame({'Driver': pd.Categorical([]), 'Progress': np.float32([]),
+                             'GapToLeader': np.float32([]), 'GapToAhead': np.float32([])})
+    checkpoints = np.arange(1, n_laps * mini_sectors_per_lap + 1) / mini_sectors_per_lap
+    times = crossing_times(tracks, checkpoints)
+
+    #leader = first car at the checkpoint, car ahead = previous car in crossing order (NaN, i.e. not reached, last)
+    gap_to_leader = times - np.nanmin(times, axis=0)
+    order = np.argsort(times, axis=0)
+    ordered = np.take_along_axis(times, order, axis=0)
+    gap_to_ahead = np.empty_like(times)
+    np.put_along_axis(gap_to_ahead, order, np.diff(ordered, axis=0, prepend=ordered[:1]), axis=0)
+
+    drivers = list(tracks)
+    reached = ~np.isnan(times)
+    driver_index, checkpoint_index = np.nonzero(reached)
+    return pd.DataFrame({
+        'Driver': pd.Categorical.from_codes(driver_index, categories=drivers),
+        'Progress': checkpoints[checkpoint_index].astype('float32'),
+        'GapToLeader': gap_to_leader[reached].astype('float32'),
+        'GapToAhead': gap_to_ahead[reached].astype('float32'),
+    })
@@ -1,52 +1,233 @@
 import fastf1
 import numpy as np
+import os
 import pandas as pd
-import re
-from datetime import date
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from utils import fastf1_cache, race_store
+from utils.data_source import source
+from utils.profiling import span
+from utils.stints import STINTS_TABLE, stint_table
+from utils.calendar_index import get_calendar
+
+#weather channels that data_cleaner attaches to every lap
+WEATHER_CHANNELS = ['Rainfall', 'TrackTemp', 'AirTemp', 'Humidity', 'WindSpeed']
+
+#one shared, size-managed fastf1 cache for all pages and workers of this process
+fastf1_cache.configure_cache()
+
+#compact laps schema (categories, float32, no duplicate columns), '0' keeps the dtypes of fastf1
+COMPACT_SCHEMA = os.environ.get('RACING_INSIGHTS_COMPACT_SCHEMA', '1') != '0'
+
+#repeated strings in the laps, stored once per race as categories
+LAPS_CATEGORIES = ['Driver', 'DriverNumber', 'Team', 'Compound', 'TrackStatus', 'DeletedReason']
+
+#measurements that don't need float64 precision (seconds stay exact to the millisecond up to ~2 hours)
+LAPS_FLOAT32 = ['Position', 'Stint', 'TyreLife', 'SpeedI1', 'SpeedI2', 'SpeedFL', 'SpeedST',
+                'TimeBehindLeaderSeconds', 'LapTimeSeconds', 'TrackTemp', 'AirTemp', 'Humidity', 'WindSpeed']
+
+#second representation of a column that is kept in another form (TimeBehindLeaderSeconds, LapTimeSeconds, Raining)
+LAPS_DUPLICATES = ['TimeBehindLeader', 'LapTime', 'Rainfall']
+
+#what session.load fetches per profile, from light to heavy ('laps' is everything data_cleaner needs)
+LOAD_PROFILES = {
+    'info': {'laps': False, 'telemetry': False, 'weather': False, 'messages': False},
+    'results': {'laps': False, 'telemetry': False, 'weather': False, 'messages': False},
+    'laps': {'laps': True, 'telemetry': False, 'weather': True, 'messages': False},
+    'full': {'laps': True, 'telemetry': True, 'weather': True, 'messages': True},
+}
+PROFILE_ORDER = list(LOAD_PROFILES)
+
+#number of sessions kept in memory per process by load_data
+MAX_CACHED_SESSIONS = 4
+
+#light profiles that don't enter the session cache unless the race is already in it: the results of a whole season
+#(Punkte) would otherwise evict the full sessions a worker keeps warm
+UNCACHED_PROFILES = {'results'}
+
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+#hit/miss counters of the session cache and the race store, read with cache_stats()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+def cache_stats():
+    """
+    Gibt die Treffer und Fehlschläge des Session-Caches von load_data, des Race Stores und des fastf1-Caches seit dem
+    Start des Prozesses zurück (z.B. für Lasttests).
+    Parameter: -
+    Return: dict
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({f"fastf1_{name}": value for name, value in fastf1_cache.cache_stats().items()})
+    return stats
 
 def load_races(year: int):
     """
     Lädt den Rennkalender für ein bestimmtes Jahr und gibt ihn zurück. Für das aktuelle Jahr werden nur Rennen
-    berücksichtigt, die bereits stattgefunden haben.
+    berücksichtigt, die bereits stattgefunden haben. Der Kalender kommt aus dem Kalender-Index (calendar_index.py)
+    und wird nur einmal pro Saison von fastf1 geladen.
     Parameter: year
     Return: calendar
     """
-    calendar = fastf1.get_event_schedule(year, include_testing=False)
-    #create custom event name and also remove the doubling of event locations with regex
-    calendar['CustomEventName'] = np.where(
-        calendar.apply(lambda row: re.search(r'\b' + re.escape(row['Location']) + r'\b', row['EventName'], re.IGNORECASE),
-                       axis=1),
-        calendar['EventName'] + " - " + "Rennen " + calendar['RoundNumber'].astype(str),
-        calendar['EventName'] + " - " + calendar['Location'] + " - " + "Rennen " + calendar['RoundNumber'].astype(str)
-    )
+    return get_calendar(year)
 
-    #limit races on calendar if year is 2025
-    if year == 2025:
-        today = pd.to_datetime(date.today())
-        calendar = calendar[calendar['EventDate'] < today]
-
-    return calendar
-
-def load_data(year: int, race_nr: str):
+def load_data(year: int, race_nr: str, profile: str = 'full'):
     """
     Lädt die Session des gewünschten Rennens und gibt sie zurück. Dies ist nicht in den data_cleaner integriert, um das
-    abrufen weitere Elemente der Session in den Visualisierungen zu ermöglichen.
-    Parameter: year, race_nr
+    abrufen weitere Elemente der Session in den Visualisierungen zu ermöglichen. Über das Profil wird nur geladen, was
+    gebraucht wird (siehe LOAD_PROFILES, 'info' erstellt nur das Session-Objekt, z.B. für Fahrer- und Reifenfarben).
+    Sessions werden im Prozess zwischengespeichert, wird später ein schwereres Profil verlangt, werden nur die
+    fehlenden Teile nachgeladen. Resultate (UNCACHED_PROFILES) von Rennen, die nicht im Cache liegen, werden ohne ihn
+    geladen, damit sie keine vollen Sessions verdrängen.
+    Parameter: year, race_nr, profile ('info', 'results', 'laps' oder 'full')
     Return: session
     """
-    session = fastf1.get_session(year, race_nr, 'R')
-    session.load()
+    key = (int(year), int(race_nr))
+    with _sessions_lock:
+        cached = _sessions.get(key)
+        _count('sessions_misses' if cached is None else 'sessions_hits')
+        if cached is None and profile not in UNCACHED_PROFILES:
+            with span('get_session', year=key[0], race_nr=key[1]):
+                session = source.get_session(year, race_nr)
+            cached = {'profile': 'info', 'session': session, 'lock': threading.Lock(), 'season_used': False}
+            _sessions[key] = cached
+        if cached is not None:
+            _sessions.move_to_end(key)
+            while len(_sessions) > MAX_CACHED_SESSIONS:
+                _sessions.popitem(last=False)
+    if cached is None:
+        return _load_uncached(key, profile)
+
+    #one lock per session, so concurrent requests for the same race wait for one load instead of starting a second
+    with cached['lock']:
+        #outside the global lock, restoring a compressed season can take a moment
+        if not cached['season_used']:
+            fastf1_cache.use_season(key[0])
+            cached['season_used'] = True
+        if PROFILE_ORDER.index(profile) > PROFILE_ORDER.index(cached['profile']):
+            loaded = LOAD_PROFILES[cached['profile']]
+            missing = {part: wanted and not loaded[part] for part, wanted in LOAD_PROFILES[profile].items()}
+            with span('session.load', profile=profile):
+                cached['session'].load(**missing)
+            cached['profile'] = profile
+            #the load may have added raw data to the fastf1 cache
+            fastf1_cache.enforce_budget()
+    return cached['session']
+
+def _load_uncached(key, profile: str):
+    #load of a light profile outside the session cache, see UNCACHED_PROFILES
+    with span('get_session', year=key[0], race_nr=key[1]):
+        session = source.get_session(*key)
+    fastf1_cache.use_season(key[0])
+    with span('session.load', profile=profile):
+        session.load(**LOAD_PROFILES[profile])
+    fastf1_cache.enforce_budget()
     return session
 
-def data_cleaner(session):
+def load_race_results(year: int, round_nr: int, event_name: str):
+    """
+    Lädt die Resultate eines einzelnen Rennens (ohne Telemetrie und Wetter) für die Punkteauswertung.
+    Parameter: year, round_nr, event_name
+    Return: results_filter
+    """
+    session = load_data(year, round_nr, profile='results')
+
+    results_filter = pd.DataFrame(session.results[["DriverNumber", "Abbreviation", "FullName", "TeamName", "TeamColor",
+                                                   "CountryCode", "Points"]])
+    results_filter["RoundNumber"] = round_nr
+    results_filter["EventName"] = event_name
+    return results_filter
+
+def load_season_results(year: int, calendar, max_workers: int = 4):
+    """
+    Lädt die Resultate aller Rennen im Kalender parallel (begrenzter Thread-Pool, das Laden wartet grösstenteils auf
+    das Netzwerk) und fügt sie einmal am Ende in Kalenderreihenfolge zusammen. Fehler einzelner Rennen brechen das
+    Laden nicht ab, sondern werden pro Rennen zurückgegeben.
+    Parameter: year, calendar (mit RoundNumber und EventName), max_workers
+    Return: combined_df, failures (dict RoundNumber -> Fehlermeldung)
+    """
+    rounds = list(zip(calendar["RoundNumber"], calendar["EventName"]))
+    frames = {}
+    failures = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {round_nr: pool.submit(load_race_results, year, round_nr, event_name)
+                   for round_nr, event_name in rounds}
+        for round_nr, future in futures.items():
+            try:
+                frames[round_nr] = future.result()
+            except Exception as e:
+                failures[round_nr] = f"{type(e).__name__}: {e}"
+
+    if not frames:
+        return pd.DataFrame(), failures
+
+    combined_df = pd.concat([frames[round_nr] for round_nr, _ in rounds if round_nr in frames], ignore_index=True)
+    return combined_df, failures
+
+def load_clean_data(year: int, race_nr: int, session=None):
+    """
+    Gibt die bereinigten Daten eines Rennens zurück. Diese werden zuerst im gemeinsamen Race Store gesucht, nur wenn
+    sie dort fehlen, wird die Session geladen (oder die übergebene verwendet), bereinigt und im Store abgelegt.
+    Parameter: year, race_nr, session (optional)
+    Return: driver_info, laps
+    """
+    with span('race_store.load'):
+        stored = race_store.load_race(year, race_nr)
+    _count('race_store_misses' if stored is None else 'race_store_hits')
+    if stored is not None:
+        driver_info, laps = stored
+        return driver_info, fastf1.core.Laps(laps)
+
+    if session is None:
+        session = load_data(year, race_nr, profile='laps')
+    with span('data_cleaner'):
+        driver_info, laps = data_cleaner(session)
+    with span('race_store.save'):
+        race_store.save_race(year, race_nr, driver_info, laps)
+    #the stint table is cheap and belongs to the cleaned race, so it is stored right away (e.g. by the ingest)
+    with span('stints.fit'):
+        race_store.save_race_table(year, race_nr, STINTS_TABLE, stint_table(laps))
+    return driver_info, laps
+
+def attach_weather(laps, weather):
+    """
+    Hängt jeder Runde die zuletzt vor dem Rundenende gemessenen Wetterwerte an (sortierter as-of Join über die
+    Session-Zeit). Runden ohne Zeit oder vor der ersten Messung erhalten NaN bzw. keinen Regen.
+    Parameter: laps, weather
+    Return: laps
+    """
+    samples = weather[['Time'] + WEATHER_CHANNELS].dropna(subset=['Time']).sort_values('Time')
+
+    #merge_asof needs sorted keys without NaT, remember the row position to write the result back in lap order
+    lap_times = pd.DataFrame({'Time': laps['Time'].to_numpy(), 'Row': np.arange(len(laps))})
+    lap_times = lap_times.dropna(subset=['Time']).sort_values('Time')
+    joined = pd.merge_asof(lap_times, samples, on='Time', direction='backward')
+    joined = joined.set_index('Row').reindex(np.arange(len(laps)))
+
+    for channel in WEATHER_CHANNELS:
+        laps[channel] = joined[channel].to_numpy()
+    laps['Rainfall'] = laps['Rainfall'].eq(True)
+
+    return laps
+
+def data_cleaner(session, compact: bool = COMPACT_SCHEMA):
     """
     Bereitet die Daten für die Visualisierung auf und gibt dataframes mit den Fahrerinfos sowie den Runden
     des gewünschten Rennens zurück.
-    Parameter: session
+    Parameter: session, compact (Runden mit compact_laps verkleinern)
     Return: driver_info, laps
     """
-    #load session results, choose columns to just have driver info
-    driver_info = session.results[['DriverNumber', 'Abbreviation', 'FullName', 'TeamName', 'ClassifiedPosition']]
+    #load session results, choose columns to just have driver info (copy so we don't write into session.results)
+    driver_info = session.results[['DriverNumber', 'Abbreviation', 'FullName', 'TeamName', 'ClassifiedPosition']].copy()
     #change markers for DNF, DSQ and DNS in ClassifiedPosition, customize driver name
     driver_info['ClassifiedPosition'] = driver_info['ClassifiedPosition'].replace({'R': 'DNF', 'E': 'DNF', 'D': 'DSQ',
                                                                                    'F': 'DNS', 'W': 'DNF', 'N': 'DNF'})
@@ -58,21 +239,16 @@ def data_cleaner(session):
     # Ensure Position is float
     laps['Position'] = laps['Position'].astype(float)
 
-    # Initialize TimeBehindLeader with proper dtype
-    laps['TimeBehindLeader'] = pd.NaT
-
-    # Loop to compute TimeBehindLeader
-    for lap in laps['LapNumber'].dropna().unique():
-        lap_data = laps[laps['LapNumber'] == lap]
-        leader_row = lap_data[lap_data['Position'] == 1.0]
+    #reference time per lap: first row of the P1 driver if there is one, otherwise the earliest time of that lap
+    #(drop_duplicates instead of groupby().first() so a missing leader time stays NaT like in the old loop), P1 rows
+    #without lap number are skipped like in the old loop
+    leader_time = laps.groupby('LapNumber')['Time'].min()
+    p1_time = (laps.loc[(laps['Position'] == 1.0) & laps['LapNumber'].notna(), ['LapNumber', 'Time']]
+               .drop_duplicates('LapNumber').set_index('LapNumber')['Time'])
+    leader_time.loc[p1_time.index] = p1_time
 
-        if not leader_row.empty:
-            leader_time = leader_row['Time'].iloc[0]
-        else:
-            leader_time = lap_data['Time'].min()
-
-        for idx in lap_data.index:
-            laps.at[idx, 'TimeBehindLeader'] = pd.to_timedelta(laps.at[idx, 'Time'] - leader_time)
+    #gap to the leader for all laps in one go, laps without lap number stay NaT
+    laps['TimeBehindLeader'] = laps['Time'] - laps['LapNumber'].map(leader_time)
 
     # Set lap 1 to 0 delta
     laps.loc[laps['LapNumber'] == 1.0, 'TimeBehindLeader'] = pd.Timedelta(0)
@@ -80,18 +256,9 @@ def data_cleaner(session):
     laps['TimeBehindLeader'] = pd.to_timedelta(laps['TimeBehindLeader'])
     laps["TimeBehindLeaderSeconds"] = laps["TimeBehindLeader"].dt.total_seconds()
 
-    #load weather dataset that contains marker raining / not raining once every minute, safe times where it does rain
-    weather = session.weather_data
-    rain_times = weather.loc[weather["Rainfall"] == True, "Time"].apply(
-        lambda td: (td.components.hours, td.components.minutes)
-    ).tolist()
-
-    #add rain information to every lap in the laps dataset
-    def is_raining(td):
-        h = td.components.hours
-        m = td.components.minutes
-        return (h, m) in rain_times
-    laps["Raining"] = laps["Time"].apply(is_raining)
+    #attach the weather samples (rain, temperatures, humidity, wind) to every lap in the laps dataset
+    laps = attach_weather(laps, session.weather_data)
+    laps["Raining"] = laps["Rainfall"]
 
     #needed transformation for correct plotting
     laps["LapTimeSeconds"] = laps["LapTime"].dt.total_seconds()
@@ -99,4 +266,25 @@ def data_cleaner(session):
     #rename missing values in tyre data (seen in 2018 data)
     laps['Compound'] = laps['Compound'].replace('nan', 'NODATA')
 
+    if compact:
+        laps = compact_laps(laps)
+
     return driver_info, laps
+
+def compact_laps(laps):
+    """
+    Verkleinert die bereinigten Runden für Cache und Race Store: wiederholte Texte werden Kategorien, Positionen,
+    Sekunden und Messwerte float32, LapNumber int16 (float32, falls Runden ohne Nummer vorkommen), und doppelte
+    Darstellungen (TimeBehindLeader, LapTime, Rainfall) fallen weg. Fehlende Spalten werden übersprungen.
+    Parameter: laps
+    Return: laps
+    """
+    laps = laps.drop(columns=[column for column in LAPS_DUPLICATES if column in laps.columns])
+    for column in LAPS_CATEGORIES:
+        if column in laps.columns:
+            laps[column] = laps[column].astype('category')
+    for column in LAPS_FLOAT32:
+        if column in laps.columns:
+            laps[column] = laps[column].astype('float32')
+    laps['LapNumber'] = laps['LapNumber'].astype('int16' if laps['LapNumber'].notna().all() else 'float32')
+    return laps
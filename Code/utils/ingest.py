@@ -0,0 +1,111 @@
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from utils import race_store
+from utils.calendar_index import SEASONS, build_calendar_index
+from utils.helper_functions import load_races, load_data, load_clean_data
+from utils.standings import update_standings
+from utils.telemetry_archive import race_archived, archive_race
+
+#kept next to the races of the current schema version, a schema bump therefore starts a fresh run
+CHECKPOINT_PATH = race_store.STORE_DIR / f"v{race_store.SCHEMA_VERSION}" / 'ingest_checkpoint.json'
+
+
+def _load_checkpoint():
+    if not CHECKPOINT_PATH.exists():
+        return {'done': {}, 'failed': {}}
+    return json.loads(CHECKPOINT_PATH.read_text())
+
+
+def _save_checkpoint(checkpoint):
+    CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    race_store.write_atomic(CHECKPOINT_PATH, lambda p: p.write_text(json.dumps(checkpoint, indent=1)))
+
+
+def ingest_race(year: int, race_nr: int, telemetry: bool = False):
+    """
+    Lädt und bereinigt ein Rennen und legt es im Race Store ab, optional zusätzlich die Telemetrie der schnellsten
+    Runden im Telemetrie-Archiv. Läuft in einem eigenen Prozess des Pools.
+    Parameter: year, race_nr, telemetry
+    Return: Dauer in Sekunden
+    """
+    start = time.perf_counter()
+    if telemetry and not race_archived(year, race_nr):
+        session = load_data(year, race_nr, profile='full')
+        load_clean_data(year, race_nr, session=session)
+        archive_race(year, race_nr, session)
+    else:
+        load_clean_data(year, race_nr)
+    return time.perf_counter() - start
+
+
+def ingest(seasons, workers: int = 4, telemetry: bool = False, retry_failed: bool = False):
+    """
+    Füllt den Race Store für ganze Saisons mit einem Prozess-Pool. Jedes fertige Rennen wird sofort im Checkpoint
+    vermerkt, ein abgebrochener Lauf setzt beim nächsten Start dort fort. Am Ende werden Durchsatz und Dauer pro
+    Rennen ausgegeben und der Punkteverlauf der Saisons aktualisiert.
+    Parameter: seasons, workers, telemetry, retry_failed
+    Return: checkpoint (dict mit done und failed)
+    """
+    checkpoint = _load_checkpoint()
+    build_calendar_index(seasons)
+
+    todo = []
+    for year in seasons:
+        for race_nr in load_races(year)['RoundNumber']:
+            key = f"{year}-{int(race_nr):02d}"
+            done = checkpoint['done'].get(key)
+            if done is not None and (done['telemetry'] or not telemetry):
+                continue
+            if key in checkpoint['failed'] and not retry_failed:
+                continue
+            todo.append((year, int(race_nr), key))
+
+    print(f"{len(todo)} Rennen zu verarbeiten ({len(checkpoint['done'])} bereits erledigt)")
+    durations = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ingest_race, year, race_nr, telemetry): key for year, race_nr, key in todo}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                duration = future.result()
+            except Exception as e:
+                checkpoint['failed'][key] = f"{type(e).__name__}: {e}"
+                print(f"{key}: fehlgeschlagen ({type(e).__name__}: {e})")
+            else:
+                checkpoint['done'][key] = {'seconds': round(duration, 2), 'telemetry': telemetry}
+                checkpoint['failed'].pop(key, None)
+                durations.append(duration)
+                print(f"{key}: {duration:.1f} s")
+            _save_checkpoint(checkpoint)
+
+    elapsed = time.perf_counter() - start
+    if durations:
+        print(f"{len(durations)} Rennen in {elapsed:.0f} s ({len(durations) / elapsed * 60:.1f} Rennen/min), "
+              f"pro Rennen Median {np.median(durations):.1f} s, p95 {np.percentile(durations, 95):.1f} s, "
+              f"Max {max(durations):.1f} s")
+
+    for year in seasons:
+        _, failures = update_standings(year, load_races(year))
+        if failures:
+            print(f"{year}: Punkteverlauf ohne Rennen {sorted(failures)}")
+
+    return checkpoint
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Füllt den Race Store offline für ganze Saisons.")
+    parser.add_argument('first_year', type=int, nargs='?', default=SEASONS[0])
+    parser.add_argument('last_year', type=int, nargs='?', default=SEASONS[-1])
+    parser.add_argument('--workers', type=int, default=4, help="Anzahl Prozesse")
+    parser.add_argument('--telemetry', action='store_true', help="zusätzlich das Telemetrie-Archiv aufbauen")
+    parser.add_argument('--retry-failed', action='store_true', help="fehlgeschlagene Rennen erneut versuchen")
+    args = parser.parse_args()
+    ingest(list(range(args.first_year, args.last_year + 1)), workers=args.workers, telemetry=args.telemetry,
+           retry_failed=args.retry_failed)
@@ -0,0 +1,161 @@
+import altair as alt
+import pandas as pd
+
+#stroke dash patterns for the linestyles of fastf1.plotting (second driver of a team is dashed)
+_DASHES = {'dashed': [6, 3]}
+_SOLID = [1, 0]
+
+#rounding of the payload, the browser doesn't need more digits for lines and tooltips
+_GAP_DECIMALS = 2
+
+
+def _status_bands(laps):
+    #rain and safety car laps as bands above the lines, like the overlay of the matplotlib figure
+    rain = pd.DataFrame({'LapNumber': sorted(laps.loc[laps['Raining'], 'LapNumber'].unique())})
+    sc = pd.DataFrame({'LapNumber': sorted(laps.loc[laps['TrackStatus'].isin(['4', '6']), 'LapNumber'].unique())})
+    layers = []
+    for frame, color, y, label in ((rain, 'deepskyblue', 0, 'Regen'), (sc, 'darkorange', 6, 'Safety Car / VSC')):
+        if frame.empty:
+            continue
+        frame = frame.assign(Start=frame['LapNumber'] - 0.5, End=frame['LapNumber'] + 0.5, Status=label)
+        layers.append(alt.Chart(frame).mark_rect(color=color, opacity=0.7).encode(
+            x='Start:Q', x2='End:Q', y=alt.value(y), y2=alt.value(y + 6),
+            tooltip=[alt.Tooltip('Status:N'), alt.Tooltip('LapNumber:Q', title='Runde')]))
+    return layers
+
+
+def position_series(race):
+    """
+    Gibt die Daten für die interaktive Grafik der Page Positionsverlauf zurück: pro Fahrer und Runde nur Position und
+    Zeitabstand (gerundet), damit der Browser sie einmal pro Rennen erhält.
+    Parameter: race (RaceData)
+    Return: series (DataFrame mit Driver, LapNumber, Position, Gap)
+    """
+    laps = race.laps
+    series = pd.DataFrame({'Driver': laps['Driver'].astype(str), 'LapNumber': laps['LapNumber'],
+                           'Position': laps['Position'],
+                           'Gap': laps['TimeBehindLeaderSeconds'].round(_GAP_DECIMALS)})
+    return series.dropna(subset=['LapNumber']).reset_index(drop=True)
+
+
+def build_position_chart(race, race_name):
+    """
+    Erstellt die interaktive Grafik der Page Positionsverlauf (Vega-Lite): Hervorheben per Klick auf Linie oder
+    Legende (Shift für mehrere Fahrer), Tooltip beim Überfahren und Wechsel der Y-Achse laufen im Browser, ohne Rerun.
+    Parameter: race (RaceData), race_name
+    Return: chart (altair)
+    """
+    series = position_series(race)
+    drivers = list(dict.fromkeys(series['Driver']))
+    styles = {driver: race.driver_style(driver) for driver in drivers}
+
+    metric = alt.param(name='metric', value='Position', bind=alt.binding_radio(
+        options=['Position', 'Gap'], labels=['Position', 'Zeit hinter Führendem (Sekunden)'], name='Y-Achse: '))
+    highlight = alt.selection_point(name='highlight', fields=['Driver'], bind='legend', on='click')
+    hover = alt.selection_point(name='hover', fields=['Driver', 'LapNumber'], on='pointerover', nearest=True,
+                                empty=False, clear='pointerout')
+
+    base = alt.Chart(series).transform_calculate(
+        Value="metric == 'Position' ? datum.Position : datum.Gap"
+    ).encode(
+        x=alt.X('LapNumber:Q', title='Runde', scale=alt.Scale(nice=False)),
+        y=alt.Y('Value:Q', title=None, scale=alt.Scale(reverse=True, zero=False)),
+    )
+    lines = base.mark_line(interpolate='linear').encode(
+        color=alt.condition(highlight, alt.Color('Driver:N', title='Fahrer', sort=drivers,
+                                                 scale=alt.Scale(domain=drivers,
+                                                                 range=[styles[d]['color'] for d in drivers])),
+                            alt.value('lightgray')),
+        strokeDash=alt.StrokeDash('Driver:N', legend=None, scale=alt.Scale(
+            domain=drivers, range=[_DASHES.get(styles[d]['linestyle'], _SOLID) for d in drivers])),
+        opacity=alt.condition(highlight, alt.value(1.0), alt.value(0.5)),
+        strokeWidth=alt.condition(highlight, alt.value(2.0), alt.value(1.0)),
+    ).add_params(metric, highlight)
+    points = base.mark_point(filled=True, size=40).encode(
+        color=alt.value('black'),
+        opacity=alt.condition(hover, alt.value(1.0), alt.value(0.0)),
+        tooltip=[alt.Tooltip('Driver:N', title='Fahrer'), alt.Tooltip('LapNumber:Q', title='Runde'),
+                 alt.Tooltip('Position:Q'), alt.Tooltip('Gap:Q', title='Zeit hinter Führendem (s)')],
+    ).add_params(hover)
+
+    return alt.layer(lines, points, *_status_bands(race.laps)).properties(
+        title=f"Positionsverlauf, {race.year} {race_name}", height=520)
+
+
+def build_gap_chart(race, gaps, race_name):
+    """
+    Erstellt die interaktive Grafik der Abstände pro Minisektor (Vega-Lite): Abstand zum Führenden oder zum Vordermann
+    über die Renndistanz. Hervorheben per Klick auf Linie oder Legende (Shift für mehrere Fahrer), Wechsel des Abstands
+    sowie Zoomen und Verschieben entlang der Runden (Mausrad, Ziehen, Doppelklick zurück) laufen im Browser.
+    Parameter: race (RaceData), gaps (RaceData.gaps), race_name
+    Return: chart (altair)
+    """
+    series = gaps.assign(Driver=gaps['Driver'].astype(str),
+                         GapToLeader=gaps['GapToLeader'].round(_GAP_DECIMALS),
+                         GapToAhead=gaps['GapToAhead'].round(_GAP_DECIMALS))
+    drivers = list(dict.fromkeys(series['Driver']))
+    styles = {driver: race.driver_style(driver) for driver in drivers}
+
+    metric = alt.param(name='gap_metric', value='GapToLeader', bind=alt.binding_radio(
+        options=['GapToLeader', 'GapToAhead'], labels=['Führender', 'Vordermann'], name='Abstand zum: '))
+    highlight = alt.selection_point(name='highlight', fields=['Driver'], bind='legend', on='click')
+    zoom = alt.selection_interval(name='zoom', bind='scales', encodings=['x'])
+
+    lines = alt.Chart(series).transform_calculate(
+        Gap="gap_metric == 'GapToLeader' ? datum.GapToLeader : datum.GapToAhead"
+    ).mark_line(interpolate='linear').encode(
+        x=alt.X('Progress:Q', title='Runde', scale=alt.Scale(nice=False)),
+        y=alt.Y('Gap:Q', title='Abstand (Sekunden)', scale=alt.Scale(reverse=True)),
+        color=alt.condition(highlight, alt.Color('Driver:N', title='Fahrer', sort=drivers,
+                                                 scale=alt.Scale(domain=drivers,
+                                                                 range=[styles[d]['color'] for d in drivers])),
+                            alt.value('lightgray')),
+        strokeDash=alt.StrokeDash('Driver:N', legend=None, scale=alt.Scale(
+            domain=drivers, range=[_DASHES.get(styles[d]['linestyle'], _SOLID) for d in drivers])),
+        opacity=alt.condition(highlight, alt.value(1.0), alt.value(0.4)),
+        strokeWidth=alt.condition(highlight, alt.value(1.8), alt.value(0.8)),
+    ).add_params(metric, highlight, zoom)
+
+    return alt.layer(lines, *_status_bands(race.laps)).properties(
+        title=f"Abstände pro Minisektor, {race.year} {race_name}", height=520)
+
+
+def points_series(drivers, driver_series):
+    """
+    Gibt die Daten für die interaktive Grafik der Page Punkte zurück: pro Fahrer und Rennen kumulierte Punkte und Rang.
+    Parameter: drivers (nach Punkten sortiert), driver_series
+    Return: series (DataFrame mit Driver, RoundNumber, CumulativePoints, Rank)
+    """
+    return pd.concat([driver_series[driver].assign(Driver=driver) for driver in drivers.index], ignore_index=True)
+
+
+def build_points_chart(drivers, driver_series, year):
+    """
+    Erstellt die interaktive Grafik der Page Punkte (Vega-Lite): Hervorheben per Klick auf Linie oder Legende (Shift
+    für mehrere Fahrer) und Tooltip laufen im Browser, ohne Rerun.
+    Parameter: drivers (nach Punkten sortiert, mit TeamColor), driver_series, year
+    Return: chart (altair)
+    """
+    series = points_series(drivers, driver_series)
+    order = list(drivers.index)
+
+    highlight = alt.selection_point(name='highlight', fields=['Driver'], bind='legend', on='click')
+    hover = alt.selection_point(name='hover', fields=['Driver', 'RoundNumber'], on='pointerover', nearest=True,
+                                empty=False, clear='pointerout')
+
+    base = alt.Chart(series).encode(x=alt.X('RoundNumber:Q', title='Rennen', axis=alt.Axis(tickMinStep=1)),
+                                    y=alt.Y('CumulativePoints:Q', title='Total Punkte'))
+    lines = base.mark_line().encode(
+        color=alt.Color('Driver:N', title='Fahrer (nach Punkten)', sort=order,
+                        scale=alt.Scale(domain=order, range=list(drivers['TeamColor']))),
+        opacity=alt.condition(highlight, alt.value(1.0), alt.value(0.2)),
+        strokeWidth=alt.condition(highlight, alt.value(2.5), alt.value(1.0)),
+    ).add_params(highlight)
+    points = base.mark_point(filled=True, size=40).encode(
+        color=alt.value('black'),
+        opacity=alt.condition(hover, alt.value(1.0), alt.value(0.0)),
+        tooltip=[alt.Tooltip('Driver:N', title='Fahrer'), alt.Tooltip('RoundNumber:Q', title='Rennen'),
+                 alt.Tooltip('CumulativePoints:Q', title='Punkte'), alt.Tooltip('Rank:Q', title='Rang')],
+    ).add_params(hover)
+
+    return alt.layer(lines, points).properties(title=f"Total Punkte der Fahrer – Saison {year}", height=520)
@@ -0,0 +1,132 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from utils import race_store
+from utils.workers import load_race, promote_race
+
+#number of background threads loading races (the cleaning runs in the worker pool), kept small so prefetching doesn't
+#starve the pages
+PREFETCH_WORKERS = 2
+
+#priorities (lower runs first): the selected race, its direct neighbours, then races two rounds away
+PRIORITY_SELECTED = 0
+PRIORITY_NEIGHBOUR = 1
+PRIORITY_FAR = 2
+
+#interval in which a page waiting for a prefetch promotes its cleaning job, the prefetch thread may not have queued it
+#yet when the page starts waiting
+PROMOTE_SECONDS = 0.5
+
+
+class Prefetcher:
+    """
+    Lädt bereinigte Renndaten im Hintergrund mit einer begrenzten Anzahl Threads und einer Prioritäts-Queue.
+    Pro Rennen gibt es höchstens einen laufenden Ladevorgang, eine Anfrage aus einer Page wartet auf diesen oder
+    übernimmt den Auftrag selbst, falls er noch in der Queue steht.
+    """
+
+    def __init__(self, max_workers: int = PREFETCH_WORKERS):
+        self.max_workers = max_workers
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def _start_workers(self):
+        #threads are only started on the first prefetch, importing the module stays free
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, daemon=True, name=f"prefetch-{len(self._workers)}")
+            worker.start()
+            self._workers.append(worker)
+
+    def _claim(self, key):
+        #returns the job if the caller should run it, None if it is already running or done
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job['claimed']:
+                return None
+            job['claimed'] = True
+            return job
+
+    def _run(self, key, job, background: bool = False):
+        try:
+            job['future'].set_result(load_race(*key, background=background))
+        except Exception as e:
+            job['future'].set_exception(e)
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def _work(self):
+        while True:
+            _, _, key = self._queue.get()
+            job = self._claim(key)
+            if job is not None:
+                self._run(key, job, background=True)
+            self._queue.task_done()
+
+    def prefetch(self, year: int, race_nr: int, priority: int = PRIORITY_NEIGHBOUR):
+        """
+        Reiht ein Rennen zum Laden im Hintergrund ein, ausser es liegt schon im Race Store oder wird bereits geladen.
+        Parameter: year, race_nr, priority
+        Return: None
+        """
+        key = (int(year), int(race_nr))
+        if (race_store.race_path(*key) / 'meta.json').exists():
+            return
+        with self._lock:
+            if key in self._jobs:
+                return
+            self._jobs[key] = {'future': Future(), 'claimed': False}
+            self._start_workers()
+        self._queue.put((priority, next(self._counter), key))
+
+    def get(self, year: int, race_nr: int):
+        """
+        Gibt driver_info und laps eines Rennens zurück. Ein noch wartender Auftrag in der Queue wird im aufrufenden
+        Thread übernommen. Lädt bereits ein Prefetch-Thread das Rennen, wird auf ihn gewartet (das Rennen wird nie
+        zweimal bereinigt) und sein Job im Worker-Pool vor die anderen Prefetches geholt.
+        Parameter: year, race_nr
+        Return: driver_info, laps
+        """
+        key = (int(year), int(race_nr))
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                job = {'future': Future(), 'claimed': True}
+                self._jobs[key] = job
+                claimed = True
+            else:
+                claimed = not job['claimed']
+                job['claimed'] = True
+
+        if claimed:
+            self._run(key, job)
+            return job['future'].result()
+        while True:
+            promote_race(*key)
+            try:
+                return job['future'].result(timeout=PROMOTE_SECONDS)
+            except TimeoutError:
+                continue
+
+
+#one prefetcher per process, shared by all pages and sessions
+prefetcher = Prefetcher()
+
+
+def prefetch_neighbours(year: int, race_nr: int, calendar):
+    """
+    Wärmt die bereinigten Daten des gewählten Rennens und der zwei Rennen davor und danach im Hintergrund vor.
+    Parameter: year, race_nr, calendar
+    Return: None
+    """
+    rounds = set(calendar['RoundNumber'])
+    prefetcher.prefetch(year, race_nr, PRIORITY_SELECTED)
+    for distance, priority in ((1, PRIORITY_NEIGHBOUR), (2, PRIORITY_FAR)):
+        for neighbour in (race_nr - distance, race_nr + distance):
+            if neighbour in rounds:
+                prefetcher.prefetch(year, neighbour, priority)
@@ -0,0 +1,153 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+#record spans in every thread of the process and write them to the metrics log (otherwise only the script runs with
+#the debug panel switched on are traced)
+PROFILING = os.environ.get('RACING_INSIGHTS_PROFILING') == '1'
+
+#optional file for the metrics log, one JSON object per finished span
+METRICS_LOG = os.environ.get('RACING_INSIGHTS_METRICS_LOG')
+
+metrics_logger = logging.getLogger('racing_insights.metrics')
+if METRICS_LOG:
+    _handler = logging.FileHandler(METRICS_LOG)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    metrics_logger.addHandler(_handler)
+    metrics_logger.setLevel(logging.INFO)
+    metrics_logger.propagate = False
+
+_local = threading.local()
+_totals = {}
+_totals_lock = threading.Lock()
+
+#returned by span() while nothing is recorded, so a disabled span costs one lookup and no allocation
+_NO_SPAN = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ('name', 'labels', 'trace', 'entry', 'start', 'depth')
+
+    def __init__(self, name, labels, trace):
+        self.name = name
+        self.labels = labels
+        self.trace = trace
+
+    def __enter__(self):
+        self.depth = getattr(_local, 'depth', 0)
+        _local.depth = self.depth + 1
+        #the entry is added on enter, so the trace lists parents before their nested spans
+        if self.trace is not None:
+            self.entry = {'name': self.name, 'depth': self.depth, 'ms': None, **self.labels}
+            self.trace.append(self.entry)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        _local.depth = self.depth
+        if self.trace is not None:
+            self.entry['ms'] = seconds * 1000
+        with _totals_lock:
+            total = _totals.setdefault(self.name, {'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            total['count'] += 1
+            total['total_s'] += seconds
+            total['max_s'] = max(total['max_s'], seconds)
+        if PROFILING:
+            metrics_logger.info(json.dumps({'span': self.name, 'seconds': round(seconds, 6), 'time': time.time(),
+                                            'thread': threading.current_thread().name, **self.labels}))
+        return False
+
+
+def span(name: str, **labels):
+    """
+    Misst die Dauer eines Abschnitts (with span('data_cleaner'): ...). Gemessen wird nur, wenn der Thread gerade eine
+    Spur aufzeichnet (Debug-Panel) oder PROFILING eingeschaltet ist, sonst passiert nichts.
+    Parameter: name, labels (zusätzliche Felder, z.B. year, race_nr)
+    Return: Context Manager
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None and not PROFILING:
+        return _NO_SPAN
+    return _Span(name, labels, trace)
+
+
+def start_trace(name: str):
+    """
+    Beginnt eine neue Spur für den aktuellen Thread (z.B. ein Rerun einer Page), alle folgenden Spans werden darin
+    unter einem Eintrag name gesammelt.
+    Parameter: name
+    Return: None
+    """
+    _local.trace = [{'name': name, 'depth': 0, 'ms': None}]
+    _local.trace_start = time.perf_counter()
+    _local.depth = 1
+
+
+def stop_trace():
+    """
+    Beendet die Spur des aktuellen Threads und trägt die Gesamtdauer beim ersten Eintrag ein.
+    Parameter: -
+    Return: trace (Liste der Spans in Startreihenfolge mit name, depth, ms) oder None, falls keine Spur lief
+    """
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    _local.depth = 0
+    if trace is not None:
+        trace[0]['ms'] = (time.perf_counter() - _local.trace_start) * 1000
+    return trace
+
+
+def metrics_snapshot():
+    """
+    Gibt Anzahl, Gesamt- und Maximaldauer pro Span seit dem Start des Prozesses zurück (maschinenlesbar, z.B. für
+    das Debug-Panel oder einen Export).
+    Parameter: -
+    Return: dict name -> {'count', 'total_s', 'max_s'}
+    """
+    with _totals_lock:
+        return {name: dict(total) for name, total in _totals.items()}
+
+
+def tracing():
+    """
+    Gibt zurück, ob im aktuellen Thread Spans gemessen werden (Spur des Debug-Panels oder PROFILING).
+    Parameter: -
+    Return: bool
+    """
+    return getattr(_local, 'trace', None) is not None or PROFILING
+
+
+def merge_trace(entries):
+    """
+    Hängt die Spur eines anderen Threads oder Prozesses (z.B. eines Worker-Jobs) eingerückt unter dem laufenden Span an
+    die Spur des aktuellen Threads an.
+    Parameter: entries (Spur aus stop_trace)
+    Return: None
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None or not entries:
+        return
+    depth = getattr(_local, 'depth', 0)
+    trace.extend({**entry, 'depth': entry['depth'] + depth} for entry in entries)
+
+
+def record_totals(entries):
+    """
+    Zählt die Spans einer Spur aus einem anderen Prozess (z.B. eines Worker-Prozesses) in den Metriken dieses Prozesses
+    mit, so erscheinen sie in metrics_snapshot.
+    Parameter: entries (Spur aus stop_trace)
+    Return: None
+    """
+    with _totals_lock:
+        for entry in entries:
+            if entry['ms'] is None:
+                continue
+            seconds = entry['ms'] / 1000
+            total = _totals.setdefault(entry['name'], {'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            total['count'] += 1
+            total['total_s'] += seconds
+            total['max_s'] = max(total['max_s'], seconds)
@@ -0,0 +1,64 @@
+import json
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from utils.profiling import start_trace, stop_trace, metrics_snapshot
+
+
+def start_page_trace(page: str):
+    """
+    Zeigt in der Sidebar den Schalter für das Profiling-Panel und beginnt, falls er eingeschaltet ist, die Spur für
+    diesen Rerun der Page. Muss vor allen zu messenden Abschnitten aufgerufen werden.
+    Parameter: page
+    Return: None
+    """
+    if st.sidebar.toggle("Profiling", key="profiling", help="Zeigt, wie lange die einzelnen Schritte dauern"):
+        start_trace(page)
+    else:
+        stop_trace()
+
+
+def show_page_trace():
+    """
+    Beendet die Spur des Reruns und zeigt die Dauer der einzelnen Abschnitte sowie die Metriken des Prozesses in der
+    Sidebar an (nur wenn das Profiling eingeschaltet ist).
+    Parameter: -
+    Return: None
+    """
+    trace = stop_trace()
+    if trace is None:
+        return
+
+    rows = pd.DataFrame({
+        'Abschnitt': ["\u2003" * entry['depth'] + entry['name'] for entry in trace],
+        'ms': [round(entry['ms'], 1) if entry['ms'] is not None else None for entry in trace],
+    })
+    with st.sidebar.expander("Profiling dieses Reruns", expanded=True):
+        st.dataframe(rows, hide_index=True)
+
+    metrics = metrics_snapshot()
+    with st.sidebar.expander("Metriken des Prozesses"):
+        st.json(metrics, expanded=False)
+        st.download_button("Als JSON herunterladen", json.dumps(metrics), file_name="metrics.json",
+                           mime="application/json")
+
+
+@contextmanager
+def page_trace(page: str):
+    """
+    Umschliesst den Code einer Page: beginnt die Spur (start_page_trace) und zeigt sie am Ende an (show_page_trace).
+    Endet der Rerun vorher mit st.stop() oder einem Fehler, wird die Spur trotzdem beendet, sonst würde sie im nächsten
+    Skriptlauf dieses Threads weiter aufzeichnen.
+    Parameter: page
+    Return: Context Manager
+    """
+    start_page_trace(page)
+    try:
+        yield
+    except BaseException:
+        #st.stop() raises a StopException (not an Exception), nothing is shown after it anymore
+        stop_trace()
+        raise
+    show_page_trace()
@@ -0,0 +1,147 @@
+import threading
+from collections import OrderedDict
+
+from utils import race_store
+from utils.app_init import lazy_import
+from utils.data_source import plotting_context
+from utils.gaps import GAPS_TABLE, compute_gaps
+from utils.helper_functions import load_data
+from utils.prefetch import prefetcher
+from utils.profiling import span
+from utils.stints import STINTS_TABLE, stint_table
+from utils.telemetry import fastest_lap_telemetry
+from utils.telemetry_archive import race_archived, archived_fastest_laps
+
+#driver colors and compound colors come from fastf1.plotting, which loads matplotlib
+plotting = lazy_import('fastf1.plotting')
+
+#number of race handles kept per process (the pages cache the same handles with st.cache_resource)
+MAX_CACHED_RACES = 8
+
+_races = OrderedDict()
+_races_lock = threading.Lock()
+
+
+class RaceData:
+    """
+    Gemeinsamer, nur lesender Zugriff auf die Daten eines Rennens für alle Pages und Sessions eines Prozesses:
+    driver_info, laps, Fahrerstile, Reifenfarben und die Telemetrie der schnellsten Runden. Die Pages bekommen bei
+    jedem Rerun dasselbe Objekt statt einer Kopie, driver_info und laps dürfen deshalb nicht verändert werden.
+    """
+
+    def __init__(self, year: int, race_nr: int, driver_info, laps, session=None):
+        self.year = year
+        self.race_nr = race_nr
+        self.driver_info = driver_info
+        self.laps = laps
+        #only set by callers without load_data (e.g. benchmarks), otherwise the session is looked up when needed and
+        #not kept alive by the handle
+        self._session = session
+        self._driver_styles = {}
+        self._compound_colors = None
+        self._gaps = None
+        self._stints = None
+        self._lock = threading.Lock()
+        #separate lock, computing the gaps loads the full session and must not block the styles
+        self._gaps_lock = threading.Lock()
+
+    def _info_session(self):
+        return self._session if self._session is not None else load_data(self.year, self.race_nr, profile='info')
+
+    def driver_style(self, abbreviation: str):
+        """
+        Gibt Farbe und Linienstil eines Fahrers zurück (fastf1.plotting), berechnet einmal pro Rennen und Fahrer.
+        Parameter: abbreviation
+        Return: dict mit color und linestyle
+        """
+        with self._lock:
+            if abbreviation not in self._driver_styles:
+                session = self._info_session()
+                with plotting_context(session):
+                    self._driver_styles[abbreviation] = plotting.get_driver_style(
+                        identifier=abbreviation, style=['color', 'linestyle'], session=session)
+            return dict(self._driver_styles[abbreviation])
+
+    def compound_colors(self):
+        """
+        Gibt die Farben der Reifentypen der Saison zurück (Kopie, darf vom Aufrufer ergänzt werden).
+        Parameter: -
+        Return: dict Reifentyp -> Farbe
+        """
+        with self._lock:
+            if self._compound_colors is None:
+                session = self._info_session()
+                with plotting_context(session):
+                    self._compound_colors = plotting.get_compound_mapping(session=session)
+            return dict(self._compound_colors)
+
+    def stints(self):
+        """
+        Gibt die Stint-Tabelle des Rennens mit dem Reifenabbau pro Stint zurück (siehe stints.py). Sie liegt neben den
+        bereinigten Daten im Race Store und wird nur für Rennen aus älteren Läufen einmal nachgerechnet.
+        Parameter: -
+        Return: stints (DataFrame)
+        """
+        with self._lock:
+            if self._stints is None:
+                stints = race_store.load_race_table(self.year, self.race_nr, STINTS_TABLE)
+                if stints is None:
+                    with span('stints.fit'):
+                        stints = stint_table(self.laps)
+                    race_store.save_race_table(self.year, self.race_nr, STINTS_TABLE, stints)
+                self._stints = stints
+            return self._stints
+
+    def gaps(self):
+        """
+        Gibt die Abstände aller Fahrer zum Führenden und zum Vordermann pro Minisektor zurück (siehe gaps.py). Sie
+        werden einmal pro Rennen aus den Fahrzeugdaten berechnet und im Race Store abgelegt.
+        Parameter: -
+        Return: gaps (DataFrame mit Driver, Progress, GapToLeader, GapToAhead)
+        """
+        with self._gaps_lock:
+            if self._gaps is None:
+                with span('race_store.load_gaps'):
+                    gaps = race_store.load_race_table(self.year, self.race_nr, GAPS_TABLE)
+                if gaps is None:
+                    session = load_data(self.year, self.race_nr, profile='full')
+                    with span('gaps.compute'):
+                        gaps = compute_gaps(session.car_data, self.laps)
+                    race_store.save_race_table(self.year, self.race_nr, GAPS_TABLE, gaps)
+                self._gaps = gaps
+            return self._gaps
+
+    def fastest_laps(self, drivers):
+        """
+        Gibt die Telemetrie der schnellsten Runden der Fahrer zurück, aus dem Telemetrie-Archiv oder sonst aus der
+        vollständig geladenen Session. Fahrer ohne gültige schnellste Runde fehlen im Ergebnis.
+        Parameter: drivers (Abkürzungen)
+        Return: dict driver -> {'telemetry': DataFrame, 'lap_time': Timedelta}
+        """
+        if race_archived(self.year, self.race_nr):
+            return archived_fastest_laps(self.year, self.race_nr, drivers)
+
+        session = load_data(self.year, self.race_nr, profile='full')
+        return fastest_lap_telemetry(session, drivers)
+
+
+def open_race_data(year: int, race_nr: int):
+    """
+    Gibt den gemeinsamen Handle eines Rennens zurück. Er wird pro Prozess einmal erstellt (die bereinigten Daten kommen
+    aus dem Race Store bzw. einem laufenden Prefetch), gleichzeitige Anfragen für dasselbe Rennen warten aufeinander.
+    Parameter: year, race_nr
+    Return: RaceData
+    """
+    key = (int(year), int(race_nr))
+    with _races_lock:
+        entry = _races.setdefault(key, {'race': None, 'lock': threading.Lock()})
+        _races.move_to_end(key)
+        while len(_races) > MAX_CACHED_RACES:
+            _races.popitem(last=False)
+
+    with entry['lock']:
+        if entry['race'] is None:
+            with span('prefetch.get'):
+                driver_info, laps = prefetcher.get(*key)  # joins a running background load of this race
+            entry['race'] = RaceData(key[0], key[1], driver_info, laps)
+    return entry['race']
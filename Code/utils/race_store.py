@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+#bump when the output of data_cleaner changes, older stored races are then ignored and rebuilt
+SCHEMA_VERSION = 2
+
+#shared location for all pages and workers, can be moved with an environment variable (e.g. to a mounted volume)
+STORE_DIR = Path(os.environ.get('RACING_INSIGHTS_STORE', Path(__file__).resolve().parent.parent / 'race_store'))
+
+
+def season_path(year: int):
+    """
+    Gibt den Ordner einer Saison im Store zurück (enthält die Rennen und saisonweite Tabellen).
+    Parameter: year
+    Return: path
+    """
+    return STORE_DIR / f"v{SCHEMA_VERSION}" / str(year)
+
+
+def race_path(year: int, race_nr: int):
+    """
+    Gibt den Ordner zurück, in dem die bereinigten Daten eines Rennens abgelegt werden.
+    Parameter: year, race_nr
+    Return: path
+    """
+    return season_path(year) / f"{int(race_nr):02d}"
+
+
+def write_atomic(path: Path, write):
+    """
+    Schreibt eine Datei zuerst unter einem temporären Namen und ersetzt dann das Ziel, damit Leser nie eine halb
+    geschriebene Datei sehen. Der temporäre Name ist pro Prozess und Thread eindeutig, gleichzeitige Schreiber (z.B.
+    mehrere Worker-Prozesse) kommen sich so nicht in die Quere, der letzte gewinnt.
+    Parameter: path, write (Funktion, die den temporären Pfad beschreibt)
+    Return: None
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_race(year: int, race_nr: int, driver_info, laps):
+    """
+    Speichert driver_info und laps eines Rennens als Parquet-Dateien im Store. Die Metadaten werden zuletzt
+    geschrieben und markieren das Rennen als vollständig.
+    Parameter: year, race_nr, driver_info, laps
+    Return: None
+    """
+    path = race_path(year, race_nr)
+    path.mkdir(parents=True, exist_ok=True)
+
+    write_atomic(path / 'driver_info.parquet',
+                  lambda p: pd.DataFrame(driver_info).to_parquet(p, compression='zstd'))
+    write_atomic(path / 'laps.parquet',
+                  lambda p: pd.DataFrame(laps).to_parquet(p, compression='zstd'))
+
+    meta = {'schema_version': SCHEMA_VERSION, 'year': int(year), 'race_nr': int(race_nr),
+            'laps': len(laps), 'drivers': len(driver_info)}
+    write_atomic(path / 'meta.json', lambda p: p.write_text(json.dumps(meta)))
+
+
+def load_race(year: int, race_nr: int):
+    """
+    Lädt driver_info und laps eines Rennens aus dem Store. Gibt None zurück, wenn das Rennen (in dieser
+    Schema-Version) noch nicht gespeichert wurde.
+    Parameter: year, race_nr
+    Return: driver_info, laps oder None
+    """
+    path = race_path(year, race_nr)
+    meta_path = path / 'meta.json'
+    if not meta_path.exists():
+        return None
+
+    meta = json.loads(meta_path.read_text())
+    if meta.get('schema_version') != SCHEMA_VERSION:
+        return None
+
+    driver_info = pd.read_parquet(path / 'driver_info.parquet')
+    laps = pd.read_parquet(path / 'laps.parquet')
+    return driver_info, laps
+
+
+def save_season_table(year: int, name: str, table):
+    """
+    Speichert eine saisonweite Tabelle (z.B. den Punkteverlauf) als Parquet-Datei im Store.
+    Parameter: year, name, table
+    Return: None
+    """
+    path = season_path(year)
+    path.mkdir(parents=True, exist_ok=True)
+    write_atomic(path / f"{name}.parquet", lambda p: pd.DataFrame(table).to_parquet(p, compression='zstd'))
+
+
+def load_season_table(year: int, name: str):
+    """
+    Lädt eine saisonweite Tabelle aus dem Store. Gibt None zurück, wenn sie noch nicht existiert.
+    Parameter: year, name
+    Return: table oder None
+    """
+    path = season_path(year) / f"{name}.parquet"
+    if not path.exists():
+        return None
+    return pd.read_parquet(path)
+
+
+def save_race_table(year: int, race_nr: int, name: str, table):
+    """
+    Speichert eine zusätzliche Tabelle eines Rennens (z.B. die Abstände pro Minisektor) als Parquet-Datei neben den
+    bereinigten Daten.
+    Parameter: year, race_nr, name, table
+    Return: None
+    """
+    path = race_path(year, race_nr)
+    path.mkdir(parents=True, exist_ok=True)
+    write_atomic(path / f"{name}.parquet", lambda p: pd.DataFrame(table).to_parquet(p, compression='zstd'))
+
+
+def load_race_table(year: int, race_nr: int, name: str):
+    """
+    Lädt eine zusätzliche Tabelle eines Rennens aus dem Store. Gibt None zurück, wenn sie noch nicht existiert.
+    Parameter: year, race_nr, name
+    Return: table oder None
+    """
+    path = race_path(year, race_nr) / f"{name}.parquet"
+    if not path.exists():
+        return None
+    return pd.read_parquet(path)
+
+
+def race_table_exists(year: int, race_nr: int, name: str):
+    """
+    Prüft, ob eine zusätzliche Tabelle eines Rennens schon im Store liegt, ohne sie zu lesen.
+    Parameter: year, race_nr, name
+    Return: bool
+    """
+    return (race_path(year, race_nr) / f"{name}.parquet").exists()
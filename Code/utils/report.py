@@ -0,0 +1,274 @@
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+
+from utils import charts
+from utils.calendar_index import SEASONS
+from utils.figure_cache import render_figure
+from utils.helper_functions import load_races, load_clean_data
+from utils.race_data import RaceData
+from utils.standings import season_summary, update_standings
+
+#default output folder, next to the race store (ignored by git)
+REPORT_DIR = Path(__file__).resolve().parent.parent / 'reports'
+
+MANIFEST_FILE = 'manifest.json'
+
+#options of every page with the same values as the widgets; a selection only lists the options it changes
+PAGE_OPTIONS = {
+    'Positionsverlauf': {'y_axis_metric': 'Position'},
+    'Rundenzeiten': {'hide_pit_laps': 'Nein', 'show_trends': 'Nein'},
+    'Geschwindigkeit': {},
+    'Punkte': {},
+}
+
+#allowed number of drivers per page, like in the pages (Positionsverlauf without drivers shows the whole field)
+PAGE_DRIVERS = {
+    'Positionsverlauf': (0, 2, 3, 4),
+    'Rundenzeiten': (2, 4),
+    'Geschwindigkeit': (2,),
+    'Punkte': None,
+}
+
+#charts rendered when no selection file is given; drivers are abbreviations or 'P<n>' for the n-th of the race
+#classification (Punkte: of the championship)
+DEFAULT_SELECTIONS = [
+    {'page': 'Positionsverlauf', 'drivers': []},
+    {'page': 'Positionsverlauf', 'drivers': [], 'options': {'y_axis_metric': 'TimeBehindLeaderSeconds'}},
+    {'page': 'Rundenzeiten', 'drivers': ['P1', 'P2'], 'options': {'show_trends': 'Ja'}},
+    {'page': 'Rundenzeiten', 'drivers': ['P1', 'P2', 'P3', 'P4'], 'options': {'hide_pit_laps': 'Ja'}},
+    {'page': 'Geschwindigkeit', 'drivers': ['P1', 'P2']},
+    {'page': 'Punkte', 'drivers': ['P1', 'P2', 'P3']},
+]
+
+
+def parse_selections(selections):
+    """
+    Prüft die Auswahl der Grafiken (Page, Fahrer, Optionen) und ergänzt die Standardwerte der Optionen.
+    Parameter: selections (Liste von dicts mit page, drivers und optional options)
+    Return: selections (vollständig)
+    """
+    parsed = []
+    for selection in selections:
+        page = selection['page']
+        if page not in PAGE_OPTIONS:
+            raise ValueError(f"Unbekannte Page: {page}")
+        drivers = [str(driver) for driver in selection.get('drivers', [])]
+        if PAGE_DRIVERS[page] is not None and len(drivers) not in PAGE_DRIVERS[page]:
+            raise ValueError(f"{page}: {len(drivers)} Fahrer, erlaubt sind {PAGE_DRIVERS[page]}")
+        unknown = set(selection.get('options', {})) - set(PAGE_OPTIONS[page])
+        if unknown:
+            raise ValueError(f"{page}: unbekannte Optionen {sorted(unknown)}")
+        parsed.append({'page': page, 'drivers': drivers, 'options': {**PAGE_OPTIONS[page],
+                                                                     **selection.get('options', {})}})
+    return parsed
+
+
+def _resolve_drivers(drivers, order):
+    #'P<n>' becomes the n-th driver of the classification, None if a driver is not part of it
+    resolved = []
+    for driver in drivers:
+        if driver[:1] == 'P' and driver[1:].isdigit():
+            position = int(driver[1:])
+            if position > len(order):
+                return None
+            resolved.append(order[position - 1])
+        elif driver in order:
+            resolved.append(driver)
+        else:
+            return None
+    return resolved
+
+
+def _classification(driver_info):
+    #finishing order, drivers without a classified position (DNF, DSQ, DNS) at the end in the order of the results
+    position = pd.to_numeric(driver_info['ClassifiedPosition'], errors='coerce')
+    return driver_info.assign(Order=position).sort_values('Order', kind='stable')['Abbreviation'].tolist()
+
+
+def _file_name(race_nr, selection, drivers):
+    parts = [f"{race_nr:02d}" if race_nr is not None else 'saison', selection['page'], '-'.join(drivers) or 'alle']
+    return '_'.join(parts + [str(value) for value in selection['options'].values()])
+
+
+def _write(fig, base_path: Path, formats):
+    #one drawing, serialized once per format
+    files = {}
+    for i, fmt in enumerate(formats):
+        data = render_figure(fig, fmt, close=i == len(formats) - 1)
+        path = base_path.with_suffix(f".{fmt}")
+        path.write_bytes(data)
+        files[fmt] = {'path': str(path), 'bytes': len(data)}
+    return files
+
+
+def _build_race_figure(race, selection, drivers, race_name):
+    page, options = selection['page'], selection['options']
+    if page == 'Positionsverlauf':
+        return charts.build_position_figure(race, drivers, options['y_axis_metric'], race_name)
+    if page == 'Rundenzeiten':
+        return charts.build_lap_times_figure(race, drivers, options['hide_pit_laps'], race_name,
+                                             options['show_trends'] == 'Ja')
+    fastest = race.fastest_laps(drivers)
+    if len(fastest) != len(drivers):
+        return None
+    return charts.build_speed_figure(fastest, race.driver_info, drivers, race.year, race_name)
+
+
+def render_race(year: int, race_nr: int, race_name: str, selections, formats, out_dir):
+    """
+    Erstellt alle Grafiken eines Rennens: die bereinigten Daten werden einmal geladen (Race Store oder fastf1) und von
+    allen Grafiken des Rennens gemeinsam genutzt, ebenso Fahrerfarben und Session. Läuft in einem eigenen Prozess des
+    Pools.
+    Parameter: year, race_nr, race_name, selections (Grafiken ausser Punkte), formats, out_dir
+    Return: entries (Manifest-Einträge), skipped, Dauer in Sekunden
+    """
+    start = time.perf_counter()
+    driver_info, laps = load_clean_data(year, race_nr)
+    race = RaceData(year, race_nr, driver_info, laps)
+    order = _classification(driver_info)
+    path = Path(out_dir) / str(year)
+    path.mkdir(parents=True, exist_ok=True)
+
+    entries, skipped = [], []
+    for selection in selections:
+        info = {'page': selection['page'], 'year': year, 'round': race_nr, 'race_name': race_name,
+                'options': selection['options']}
+        drivers = _resolve_drivers(selection['drivers'], order)
+        if drivers is None:
+            skipped.append({**info, 'drivers': selection['drivers'], 'reason': "Fahrer nicht im Rennen"})
+            continue
+        chart_start = time.perf_counter()
+        fig = _build_race_figure(race, selection, drivers, race_name)
+        if fig is None:
+            skipped.append({**info, 'drivers': drivers, 'reason': "keine gültige schnellste Runde"})
+            continue
+        files = _write(fig, path / _file_name(race_nr, selection, drivers), formats)
+        entries.append({**info, 'drivers': drivers, 'files': files,
+                        'seconds': round(time.perf_counter() - chart_start, 3)})
+    return entries, skipped, time.perf_counter() - start
+
+
+def render_season(year: int, selections, formats, out_dir):
+    """
+    Erstellt die Grafiken des Punkteverlaufs einer Saison (Page Punkte) aus dem materialisierten Punkteverlauf.
+    Läuft in einem eigenen Prozess des Pools.
+    Parameter: year, selections (nur Punkte), formats, out_dir
+    Return: entries (Manifest-Einträge), skipped, Dauer in Sekunden
+    """
+    start = time.perf_counter()
+    standings, failures = update_standings(year, load_races(year)[['RoundNumber', 'EventName']])
+    if standings is None or standings.empty:
+        raise RuntimeError(f"kein Punkteverlauf für {year}: {failures}")
+    drivers, series = season_summary(standings)
+    path = Path(out_dir) / str(year)
+    path.mkdir(parents=True, exist_ok=True)
+
+    entries, skipped = [], []
+    for selection in selections:
+        info = {'page': 'Punkte', 'year': year, 'round': None, 'race_name': None, 'options': selection['options']}
+        highlight = _resolve_drivers(selection['drivers'], list(drivers.index))
+        if highlight is None:
+            skipped.append({**info, 'drivers': selection['drivers'], 'reason': "Fahrer nicht in der Saison"})
+            continue
+        chart_start = time.perf_counter()
+        fig = charts.build_points_figure(drivers, series, highlight, year)
+        files = _write(fig, path / _file_name(None, selection, highlight), formats)
+        entries.append({**info, 'drivers': highlight, 'files': files, 'missing_rounds': sorted(failures),
+                        'seconds': round(time.perf_counter() - chart_start, 3)})
+    return entries, skipped, time.perf_counter() - start
+
+
+def render_report(seasons, selections=DEFAULT_SELECTIONS, formats=('png',), out_dir=REPORT_DIR, workers: int = 4,
+                  rounds=None):
+    """
+    Erstellt ohne Streamlit alle Grafiken für die Saisons in einem Prozess-Pool (ein Auftrag pro Rennen und pro
+    Saison) und schreibt sie zusammen mit einem Manifest (manifest.json) in out_dir. Am Ende werden Durchsatz und
+    Dauer pro Auftrag ausgegeben.
+    Parameter: seasons, selections, formats ('png', 'svg'), out_dir, workers, rounds (optional nur diese Rennen)
+    Return: manifest (dict)
+    """
+    selections = parse_selections(selections)
+    race_selections = [s for s in selections if s['page'] != 'Punkte']
+    season_selections = [s for s in selections if s['page'] == 'Punkte']
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = {'created': datetime.now().isoformat(timespec='seconds'), 'seasons': list(seasons),
+                'formats': list(formats), 'charts': [], 'skipped': [], 'failed': {}}
+    durations = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for year in seasons:
+            calendar = load_races(year)
+            if season_selections:
+                futures[pool.submit(render_season, year, season_selections, formats, str(out_dir))] = f"{year}"
+            if not race_selections:
+                continue
+            for race_nr, race_name in zip(calendar['RoundNumber'], calendar['EventName']):
+                if rounds and int(race_nr) not in rounds:
+                    continue
+                futures[pool.submit(render_race, year, int(race_nr), race_name, race_selections, formats,
+                                    str(out_dir))] = f"{year}-{int(race_nr):02d}"
+
+        print(f"{len(futures)} Aufträge ({len(race_selections)} Grafiken pro Rennen, {len(season_selections)} pro "
+              f"Saison), {workers} Prozesse")
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                entries, skipped, duration = future.result()
+            except Exception as e:
+                manifest['failed'][key] = f"{type(e).__name__}: {e}"
+                print(f"{key}: fehlgeschlagen ({type(e).__name__}: {e})")
+                continue
+            manifest['charts'].extend(entries)
+            manifest['skipped'].extend(skipped)
+            durations.append(duration)
+            print(f"{key}: {len(entries)} Grafiken in {duration:.1f} s"
+                  + (f", {len(skipped)} übersprungen" if skipped else ''))
+
+    elapsed = time.perf_counter() - start
+    #paths in the manifest relative to it, so the folder can be published as is
+    for entry in manifest['charts']:
+        for file in entry['files'].values():
+            file['path'] = str(Path(file['path']).relative_to(out_dir))
+    manifest['charts'].sort(key=lambda entry: (entry['year'], entry['round'] or 0, entry['page']))
+    manifest['throughput'] = {'charts': len(manifest['charts']), 'jobs': len(durations),
+                              'elapsed_s': round(elapsed, 1),
+                              'charts_per_s': round(len(manifest['charts']) / elapsed, 2) if elapsed else None}
+    (out_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=1, ensure_ascii=False))
+
+    if durations:
+        print(f"{len(manifest['charts'])} Grafiken in {elapsed:.0f} s ({len(manifest['charts']) / elapsed:.2f} "
+              f"Grafiken/s), pro Auftrag Median {np.median(durations):.1f} s, "
+              f"p95 {np.percentile(durations, 95):.1f} s, Max {max(durations):.1f} s")
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Erstellt alle Grafiken für ganze Saisons ohne Streamlit (PNG/SVG "
+                                                 "mit Manifest).")
+    parser.add_argument('first_year', type=int, nargs='?', default=SEASONS[0])
+    parser.add_argument('last_year', type=int, nargs='?', default=SEASONS[-1])
+    parser.add_argument('--rounds', type=int, nargs='*', help="nur diese Rennen (z.B. das letzte Wochenende)")
+    parser.add_argument('--formats', nargs='+', default=['png'], choices=['png', 'svg'])
+    parser.add_argument('--selections', help="JSON-Datei mit der Auswahl der Grafiken (Liste von page, drivers, "
+                                             "options), sonst DEFAULT_SELECTIONS")
+    parser.add_argument('--out', default=str(REPORT_DIR), help="Ausgabeordner")
+    parser.add_argument('--workers', type=int, default=4, help="Anzahl Prozesse")
+    args = parser.parse_args()
+
+    selections = json.loads(Path(args.selections).read_text()) if args.selections else DEFAULT_SELECTIONS
+    render_report(list(range(args.first_year, args.last_year + 1)), selections, args.formats, args.out,
+                  args.workers, args.rounds)
@@ -0,0 +1,70 @@
+import pandas as pd
+
+from utils import race_store
+from utils.helper_functions import load_season_results
+from utils.profiling import span
+
+#name of the season table in the race store
+STANDINGS_TABLE = 'standings'
+
+
+def _materialize(results):
+    """
+    Berechnet die kumulierten Punkte und den Rang nach jedem Rennen sowie den Anzeigenamen der Fahrer.
+    Parameter: results (Resultate aller geladenen Rennen)
+    Return: standings
+    """
+    standings = results.sort_values("RoundNumber", kind="stable").reset_index(drop=True)
+    standings["CumulativePoints"] = standings.groupby("Abbreviation")["Points"].cumsum()
+    standings["Rank"] = (standings.groupby("RoundNumber")["CumulativePoints"]
+                         .rank(method="min", ascending=False).astype(int))
+    standings["CustomDriverName"] = (standings["DriverNumber"] + " - " + standings["FullName"]
+                                     + " - " + standings["TeamName"])
+    return standings
+
+
+def update_standings(year: int, calendar):
+    """
+    Gibt den materialisierten Punkteverlauf einer Saison zurück. Bereits gespeicherte Rennen werden aus dem Race Store
+    gelesen, nur neu abgeschlossene Rennen aus dem Kalender werden bei fastf1 geladen und angehängt.
+    Parameter: year, calendar (mit RoundNumber und EventName)
+    Return: standings, failures (dict RoundNumber -> Fehlermeldung)
+    """
+    standings = race_store.load_season_table(year, STANDINGS_TABLE)
+    known_rounds = set() if standings is None else set(standings["RoundNumber"])
+    new_rounds = calendar[~calendar["RoundNumber"].isin(known_rounds)]
+
+    if new_rounds.empty:
+        return standings, {}
+
+    with span('load_season_results', rounds=len(new_rounds)):
+        new_results, failures = load_season_results(year, new_rounds)
+    if new_results.empty:
+        return standings if standings is not None else pd.DataFrame(), failures
+
+    #cumulative points and ranks are only recomputed when rounds are appended, not on every page rerun
+    results = new_results if standings is None else pd.concat(
+        [standings[new_results.columns], new_results], ignore_index=True)
+    with span('standings.materialize'):
+        standings = _materialize(results)
+    race_store.save_season_table(year, STANDINGS_TABLE, standings)
+    return standings, failures
+
+
+def season_summary(standings):
+    """
+    Bereitet den Punkteverlauf für die Visualisierung auf: Fahrer sortiert nach Punkten mit Anzeigename und Teamfarbe
+    sowie die Punkteverläufe pro Fahrer.
+    Parameter: standings
+    Return: drivers (DataFrame mit Index Abbreviation), series (dict Abbreviation -> DataFrame)
+    """
+    first_rows = standings.drop_duplicates("Abbreviation").set_index("Abbreviation")
+    drivers = pd.DataFrame({
+        "FinalPoints": standings.groupby("Abbreviation")["CumulativePoints"].max(),
+        "CustomDriverName": first_rows["CustomDriverName"],
+        "TeamColor": "#" + first_rows["TeamColor"],
+    }).sort_values("FinalPoints", ascending=False, kind="stable")
+
+    series = {abbr: group[["RoundNumber", "CumulativePoints", "Rank"]]
+              for abbr, group in standings.groupby("Abbreviation", sort=False)}
+    return drivers, series
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+#name of the race table in the race store, saved together with the cleaned race
+STINTS_TABLE = 'stints'
+
+#lap time a car gains per lap as fuel burns off (about 0.03 s per kg at roughly 1.8 kg per lap)
+FUEL_SECONDS_PER_LAP = 0.055
+
+#a degradation slope is only fitted with at least this many clean laps in the stint
+MIN_FIT_LAPS = 3
+
+#track status codes of neutralised laps: safety car (4), red flag (5), virtual safety car (6, 7)
+NEUTRALISED_STATUS = '[4567]'
+
+
+def assign_stints(laps):
+    """
+    Nummeriert die Stints jedes Fahrers anhand der Boxenausfahrten: jede Runde mit PitOutTime (ausser der ersten Runde
+    eines Fahrers, z.B. Start aus der Boxengasse) beginnt einen neuen Stint.
+    Parameter: laps (bereinigt)
+    Return: stint (Series mit dem Index von laps)
+    """
+    ordered = laps.sort_values(['Driver', 'LapNumber'])
+    first_lap = ordered.groupby('Driver', observed=True).cumcount() == 0
+    new_stint = ordered['PitOutTime'].notna() & ~first_lap
+    stint = new_stint.groupby(ordered['Driver'], observed=True).cumsum() + 1
+    return stint.reindex(laps.index)
+
+
+def fit_laps(laps):
+    """
+    Markiert die Runden, die in die Regression eingehen: gültige Rundenzeit, keine erste Rennrunde, keine In- oder
+    Out-Lap und keine Safety-Car-, VSC-, Rotphasen- oder Regenrunde.
+    Parameter: laps (bereinigt)
+    Return: mask (Series bool)
+    """
+    neutralised = laps['TrackStatus'].astype(str).str.contains(NEUTRALISED_STATUS, na=False)
+    return (laps['LapTimeSeconds'].notna() & (laps['LapNumber'] > 1) & laps['PitInTime'].isna()
+            & laps['PitOutTime'].isna() & ~neutralised & ~laps['Raining'].astype(bool))
+
+
+def stint_table(laps, fuel_seconds_per_lap: float = FUEL_SECONDS_PER_LAP):
+    """
+    Erstellt die Stint-Tabelle eines Rennens für alle Fahrer: Start- und Endrunde, Reifentyp, Reifenalter und der
+    Reifenabbau pro Runde. Die Rundenzeiten werden um den Gewinn durch das verbrannte Benzin korrigiert, dann wird pro
+    Stint eine Gerade (Zeit über Reifenalter) gelegt, für alle Stints zusammen in einem Durchgang über gruppierte Summen.
+    Stints mit weniger als MIN_FIT_LAPS sauberen Runden haben keinen Abbau (NaN).
+    Parameter: laps (bereinigt), fuel_seconds_per_lap
+    Return: stints (DataFrame mit Driver, Stint, Compound, StartLap, EndLap, Laps, TyreAgeStart, TyreAgeEnd,
+            FitLaps, BaseLapTime, Degradation, DegradationDelta)
+    """
+    laps = laps.assign(StintNr=assign_stints(laps))
+    total_laps = laps['LapNumber'].max()
+
+    #tyre age from the timing data, otherwise counted from the first lap of the stint
+    stint_keys = [laps['Driver'], laps['StintNr']]
+    first_lap = laps.groupby(stint_keys, observed=True)['LapNumber'].transform('min')
+    tyre_age = laps['TyreLife'].astype(float) if 'TyreLife' in laps.columns else pd.Series(np.nan, index=laps.index)
+    tyre_age = tyre_age.fillna(laps['LapNumber'] - first_lap + 1)
+    laps = laps.assign(TyreAge=tyre_age)
+
+    stints = laps.groupby(['Driver', 'StintNr'], observed=True, sort=True).agg(
+        Compound=('Compound', 'first'), StartLap=('LapNumber', 'min'), EndLap=('LapNumber', 'max'),
+        Laps=('LapNumber', 'size'), TyreAgeStart=('TyreAge', 'min'), TyreAgeEnd=('TyreAge', 'max'),
+    ).reset_index().rename(columns={'StintNr': 'Stint'})
+
+    #batched least squares: the sums per stint give slope and intercept of every stint at once
+    clean = laps[fit_laps(laps)]
+    row = pd.MultiIndex.from_frame(stints[['Driver', 'Stint']]).get_indexer(
+        pd.MultiIndex.from_arrays([clean['Driver'], clean['StintNr']]))
+    #laps without driver or lap number belong to no stint
+    clean, row = clean[row >= 0], row[row >= 0]
+    x = clean['TyreAge'].to_numpy(dtype=float)
+    y = (clean['LapTimeSeconds'].to_numpy(dtype=float)
+         - fuel_seconds_per_lap * (total_laps - clean['LapNumber'].to_numpy(dtype=float)))
+    n = np.bincount(row, minlength=len(stints)).astype(float)
+    sx, sy = np.bincount(row, x, len(stints)), np.bincount(row, y, len(stints))
+    sxx, sxy = np.bincount(row, x * x, len(stints)), np.bincount(row, x * y, len(stints))
+
+    denominator = n * sxx - sx ** 2
+    fitted = (n >= MIN_FIT_LAPS) & (denominator > 0)
+    slope = np.divide(n * sxy - sx * sy, denominator, out=np.full(len(stints), np.nan), where=fitted)
+    intercept = np.divide(sy - slope * sx, n, out=np.full(len(stints), np.nan), where=fitted)
+
+    stints['FitLaps'] = n.astype(int)
+    stints['BaseLapTime'] = intercept.astype('float32')
+    stints['Degradation'] = slope.astype('float32')
+    #compared to the field on the same compound, positive = the tyres wear faster than usual
+    stints['DegradationDelta'] = (stints['Degradation']
+                                  - stints.groupby('Compound', observed=True)['Degradation'].transform('median'))
+    return stints
+
+
+def stint_trend(stint, total_laps: int, fuel_seconds_per_lap: float = FUEL_SECONDS_PER_LAP):
+    """
+    Gibt die Trendlinie eines Stints als Rundenzeit (inklusive Benzineffekt, also vergleichbar mit LapTimeSeconds)
+    für jede Runde des Stints zurück.
+    Parameter: stint (Zeile der Stint-Tabelle), total_laps, fuel_seconds_per_lap
+    Return: lap_numbers, lap_times
+    """
+    lap_numbers = np.arange(stint['StartLap'], stint['EndLap'] + 1)
+    tyre_age = stint['TyreAgeStart'] + lap_numbers - stint['StartLap']
+    lap_times = (stint['BaseLapTime'] + stint['Degradation'] * tyre_age
+                 + fuel_seconds_per_lap * (total_laps - lap_numbers))
+    return lap_numbers, lap_times
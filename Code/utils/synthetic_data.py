@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+#grid of the 2024 season, used for results, laps and the plotting colors
+GRID = [
+    ('1', 'VER', 'Max', 'Verstappen', 'Red Bull Racing', '3671c6'),
+    ('11', 'PER', 'Sergio', 'Perez', 'Red Bull Racing', '3671c6'),
+    ('16', 'LEC', 'Charles', 'Leclerc', 'Ferrari', 'e8002d'),
+    ('55', 'SAI', 'Carlos', 'Sainz', 'Ferrari', 'e8002d'),
+    ('44', 'HAM', 'Lewis', 'Hamilton', 'Mercedes', '27f4d2'),
+    ('63', 'RUS', 'George', 'Russell', 'Mercedes', '27f4d2'),
+    ('4', 'NOR', 'Lando', 'Norris', 'McLaren', 'ff8000'),
+    ('81', 'PIA', 'Oscar', 'Piastri', 'McLaren', 'ff8000'),
+    ('14', 'ALO', 'Fernando', 'Alonso', 'Aston Martin', '229971'),
+    ('18', 'STR', 'Lance', 'Stroll', 'Aston Martin', '229971'),
+    ('10', 'GAS', 'Pierre', 'Gasly', 'Alpine', '0093cc'),
+    ('31', 'OCO', 'Esteban', 'Ocon', 'Alpine', '0093cc'),
+    ('23', 'ALB', 'Alexander', 'Albon', 'Williams', '64c4ff'),
+    ('2', 'SAR', 'Logan', 'Sargeant', 'Williams', '64c4ff'),
+    ('22', 'TSU', 'Yuki', 'Tsunoda', 'RB', '6692ff'),
+    ('3', 'RIC', 'Daniel', 'Ricciardo', 'RB', '6692ff'),
+    ('77', 'BOT', 'Valtteri', 'Bottas', 'Kick Sauber', '52e252'),
+    ('24', 'ZHO', 'Guanyu', 'Zhou', 'Kick Sauber', '52e252'),
+    ('20', 'MAG', 'Kevin', 'Magnussen', 'Haas F1 Team', 'b6babd'),
+    ('27', 'HUL', 'Nico', 'Hulkenberg', 'Haas F1 Team', 'b6babd'),
+]
+
+POINTS = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1] + [0] * 10
+
+
+def _results(rng, order):
+    rows = []
+    for position, i in enumerate(order, start=1):
+        number, abbreviation, first_name, last_name, team, color = GRID[i]
+        classified = str(position) if position <= 17 else rng.choice(['R', 'R', 'D'])
+        rows.append({'DriverNumber': number, 'Abbreviation': abbreviation, 'FirstName': first_name,
+                     'LastName': last_name, 'FullName': f"{first_name} {last_name}", 'TeamName': team,
+                     'TeamColor': color, 'CountryCode': 'XXX', 'Position': float(position),
+                     'ClassifiedPosition': classified, 'Points': float(POINTS[position - 1])})
+    results = pd.DataFrame(rows)
+    results.index = results['DriverNumber'].values
+    return results
+
+
+def synthetic_race(year: int, race_nr: int, n_laps: int = 57):
+    """
+    Erzeugt die Daten eines Rennens mit 20 Fahrern über n_laps Runden inklusive Boxenstopps, Reifenwechsel,
+    Safety-Car-Phase, Regenschauer und einzelnen fehlenden Werten, wie sie in echten Daten vorkommen. Gleiche
+    Saison und Runde ergeben immer die gleichen Daten.
+    Parameter: year, race_nr, n_laps
+    Return: laps, results, weather_data (DataFrames im Format der fastf1-Session)
+    """
+    rng = np.random.default_rng(year * 100 + race_nr)
+    n_drivers = len(GRID)
+    pace = rng.normal(92.0, 0.6, n_drivers)
+
+    #lap times per driver and lap: base pace, tyre wear, fuel burn, pit stops and a safety car phase
+    sc_laps = set(range(n_laps // 3, n_laps // 3 + 4))
+    pit_lap = rng.integers(12, n_laps - 15, n_drivers)
+    lap_times = pace[:, None] + rng.normal(0, 0.35, (n_drivers, n_laps)) - np.linspace(0, 2.5, n_laps)[None, :]
+    lap_times[:, 0] += 6
+    for lap in sc_laps:
+        lap_times[:, lap - 1] += 25
+    lap_times[np.arange(n_drivers), pit_lap - 1] += 21
+    session_time = 3600 + np.cumsum(lap_times, axis=1)
+    positions = session_time.argsort(axis=0).argsort(axis=0) + 1.0
+
+    compounds = np.array(['SOFT', 'MEDIUM', 'HARD'])
+    rows = []
+    for d, (number, abbreviation, _, _, team, _) in enumerate(GRID):
+        for lap in range(1, n_laps + 1):
+            stint = 1 if lap <= pit_lap[d] else 2
+            time = pd.Timedelta(seconds=session_time[d, lap - 1])
+            lap_time = pd.Timedelta(seconds=lap_times[d, lap - 1])
+            sectors = lap_times[d, lap - 1] * np.array([0.32, 0.43, 0.25])
+            rows.append({
+                'Time': time, 'Driver': abbreviation, 'DriverNumber': number, 'LapTime': lap_time,
+                'LapNumber': float(lap), 'Stint': float(stint),
+                'PitOutTime': time - lap_time + pd.Timedelta(seconds=2) if lap == pit_lap[d] + 1 else pd.NaT,
+                'PitInTime': time - pd.Timedelta(seconds=3) if lap == pit_lap[d] else pd.NaT,
+                'Sector1Time': pd.Timedelta(seconds=sectors[0]), 'Sector2Time': pd.Timedelta(seconds=sectors[1]),
+                'Sector3Time': pd.Timedelta(seconds=sectors[2]),
+                'Sector1SessionTime': time - lap_time + pd.Timedelta(seconds=sectors[0]),
+                'Sector2SessionTime': time - pd.Timedelta(seconds=sectors[2]),
+                'Sector3SessionTime': time,
+                'SpeedI1': rng.normal(235, 5), 'SpeedI2': rng.normal(250, 5), 'SpeedFL': rng.normal(276, 4),
+                'SpeedST': rng.normal(290, 8), 'IsPersonalBest': False,
+                'Compound': compounds[(d + stint) % 3], 'TyreLife': float(lap if stint == 1 else lap - pit_lap[d]),
+                'FreshTyre': stint == 2, 'Team': team, 'LapStartTime': time - lap_time,
+                'LapStartDate': pd.Timestamp(year=year, month=3, day=2, hour=15) + (time - lap_time),
+                'TrackStatus': '4' if lap in sc_laps else '1', 'Position': positions[d, lap - 1],
+                'Deleted': False, 'DeletedReason': '', 'FastF1Generated': False, 'IsAccurate': lap not in sc_laps,
+            })
+    laps = pd.DataFrame(rows)
+
+    #gaps as they occur in real timing data
+    laps.loc[laps.sample(frac=0.01, random_state=rng).index, 'Position'] = np.nan
+    laps.loc[laps.sample(frac=0.005, random_state=rng).index, 'Compound'] = 'nan'
+
+    #one weather sample per minute with a short rain shower in the second half
+    samples = int(session_time.max() - 3600) // 60 + 70
+    weather = pd.DataFrame({
+        'Time': pd.to_timedelta(np.arange(samples) * 60 + 14.0, unit='s'),
+        'AirTemp': rng.normal(19, 0.3, samples), 'Humidity': rng.normal(46, 1, samples),
+        'Pressure': rng.normal(1017, 0.2, samples), 'Rainfall': False,
+        'TrackTemp': rng.normal(26, 0.5, samples), 'WindDirection': rng.integers(0, 360, samples),
+        'WindSpeed': rng.uniform(0.5, 2, samples),
+    })
+    weather.loc[int(samples * 0.7):int(samples * 0.75), 'Rainfall'] = True
+
+    results = _results(rng, np.argsort(session_time[:, -1]))
+    return laps, results, weather
+
+
+def synthetic_fastest_laps(drivers, n_samples: int = 750, seed: int = 0):
+    """
+    Erzeugt Telemetrie der schnellsten Runde pro Fahrer im Format von telemetry.fastest_lap_telemetry (eine geschlossene
+    Strecke von ca. 5.4 km mit Geraden und Kurven, leicht unterschiedliche Samplingpunkte pro Fahrer).
+    Parameter: drivers (Abkürzungen), n_samples, seed
+    Return: dict driver -> {'telemetry': DataFrame, 'lap_time': Timedelta}
+    """
+    rng = np.random.default_rng(seed)
+    fastest = {}
+    for driver in drivers:
+        distance = np.sort(rng.uniform(0, 5412, n_samples))
+        angle = distance / 5412 * 2 * np.pi
+        speed = 210 + 90 * np.sin(angle * 7) + rng.normal(0, 4, n_samples)
+        fastest[driver] = {
+            'telemetry': pd.DataFrame({
+                'Distance': distance,
+                'X': np.cos(angle) * 3000 + 400 * np.cos(angle * 3),
+                'Y': np.sin(angle) * 1800 + 300 * np.sin(angle * 5),
+                'Speed': speed,
+                'Throttle': np.clip(speed / 3, 0, 100),
+                'Brake': speed < 160,
+                'nGear': np.clip(speed // 40, 1, 8).astype(int),
+            }),
+            'lap_time': pd.Timedelta(seconds=rng.normal(92.6, 0.3)),
+        }
+    return fastest
+
+
+def _track_speed(fraction):
+    #speed profile of the synthetic track (7 slow corners per lap), fraction of the lap from 0 to 1
+    return 210 + 90 * np.sin(fraction * 2 * np.pi * 7)
+
+
+def synthetic_car_data(laps, hz: float = 4.0, seed: int = 0):
+    """
+    Erzeugt Fahrzeugdaten (Geschwindigkeit über die Session-Zeit, hz Samples pro Sekunde) im Format von
+    session.car_data. Jede Runde folgt dem Geschwindigkeitsprofil der synthetischen Strecke und dauert genau so lange
+    wie in laps, funktioniert also für synthetische und aufgenommene Runden.
+    Parameter: laps (mit DriverNumber, LapStartTime, Time), hz, seed
+    Return: dict DriverNumber -> DataFrame mit SessionTime und Speed
+    """
+    rng = np.random.default_rng(seed)
+    #share of the lap time spent up to each point of the lap, slow sections take longer
+    fraction_grid = np.linspace(0, 1, 1001)
+    pace = 1 / _track_speed(fraction_grid)
+    time_share = np.concatenate([[0], np.cumsum((pace[1:] + pace[:-1]) / 2)])
+    time_share /= time_share[-1]
+
+    car_data = {}
+    for number, driver_laps in laps.groupby('DriverNumber', observed=True, sort=False):
+        driver_laps = driver_laps.dropna(subset=['LapStartTime', 'Time']).sort_values('Time')
+        if driver_laps.empty:
+            continue
+        starts = driver_laps['LapStartTime'].dt.total_seconds().to_numpy()
+        ends = driver_laps['Time'].dt.total_seconds().to_numpy()
+        seconds = np.arange(starts[0], ends[-1], 1 / hz)
+        lap = np.clip(np.searchsorted(ends, seconds, side='right'), 0, len(ends) - 1)
+        fraction = np.interp((seconds - starts[lap]) / (ends[lap] - starts[lap]), time_share, fraction_grid)
+        car_data[str(number)] = pd.DataFrame({'SessionTime': pd.to_timedelta(seconds, unit='s'),
+                                              'Speed': _track_speed(fraction) + rng.normal(0, 2, len(seconds))})
+    return car_data
+
+
+def synthetic_season_results(n_rounds: int = 24, seed: int = 0):
+    """
+    Erzeugt die Resultate einer Saison im Format von helper_functions.load_season_results.
+    Parameter: n_rounds, seed
+    Return: results
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for round_nr in range(1, n_rounds + 1):
+        results = _results(rng, rng.permutation(len(GRID)))
+        results = results[['DriverNumber', 'Abbreviation', 'FullName', 'TeamName', 'TeamColor', 'CountryCode',
+                           'Points']].copy()
+        results['RoundNumber'] = round_nr
+        results['EventName'] = synthetic_event_name(round_nr)
+        frames.append(results)
+    return pd.concat(frames, ignore_index=True)
+
+
+def synthetic_event_name(race_nr: int):
+    return f"Synthetic Grand Prix {race_nr}"
+
+
+def synthetic_schedule(year: int, n_rounds: int = 24):
+    """
+    Erzeugt einen Rennkalender im Format von fastf1.get_event_schedule mit einem Rennen alle zwei Wochen ab März.
+    Parameter: year, n_rounds
+    Return: schedule
+    """
+    rounds = np.arange(1, n_rounds + 1)
+    return pd.DataFrame({
+        'RoundNumber': rounds,
+        'Country': [f"Country {r}" for r in rounds],
+        'Location': [f"Circuit {r}" for r in rounds],
+        'EventName': [synthetic_event_name(r) for r in rounds],
+        'EventDate': pd.Timestamp(year=year, month=3, day=2) + pd.to_timedelta((rounds - 1) * 14, unit='D'),
+    })
@@ -0,0 +1,138 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.data_source import source
+from utils.profiling import span
+
+#telemetry channels kept per fastest lap (everything the speed maps and the archive need)
+TELEMETRY_CHANNELS = ['Distance', 'X', 'Y', 'Speed', 'Throttle', 'Brake', 'nGear']
+
+#point budget of a drawn track map line (per driver), see downsample_track
+TRACK_MAP_POINTS = 300
+
+#number of races whose fastest-lap telemetry is kept in memory per process
+MAX_CACHED_RACES = 8
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def fastest_lap_telemetry(session, drivers):
+    """
+    Gibt pro Fahrer die Telemetrie und Rundenzeit der schnellsten Runde zurück. pick_fastest und das teure Mergen der
+    Telemetrie passieren pro Rennen und Fahrer nur einmal, danach kommen die Daten aus einem Cache im Prozess.
+    Parameter: session, drivers (Abkürzungen)
+    Return: dict driver -> {'telemetry': DataFrame, 'lap_time': Timedelta}, Fahrer ohne gültige schnellste Runde fehlen
+    """
+    with _cache_lock:
+        race_cache = _cache.setdefault(session.api_path, {})
+        _cache.move_to_end(session.api_path)
+        while len(_cache) > MAX_CACHED_RACES:
+            _cache.popitem(last=False)
+
+    result = {}
+    for driver in drivers:
+        if driver not in race_cache:
+            with span('telemetry.fastest_lap', driver=driver):
+                lap = source.fastest_lap(session, driver)
+            #a missing fastest lap is cached as None too, it doesn't appear on the next rerun either
+            race_cache[driver] = None if lap is None else {
+                'telemetry': lap[0][[c for c in TELEMETRY_CHANNELS if c in lap[0].columns]].reset_index(drop=True),
+                'lap_time': lap[1],
+            }
+        if race_cache[driver] is not None:
+            result[driver] = race_cache[driver]
+    return result
+
+
+def resample_telemetry(telemetries, channels=('X', 'Y', 'Speed'), num_points: int = 500):
+    """
+    Interpoliert die Telemetrie mehrerer Fahrer linear auf ein gemeinsames Distanz-Raster von 0 bis zur kürzesten
+    Rundendistanz (Extrapolation an den Rändern wie bei interp1d mit fill_value="extrapolate"). Alle Fahrer und Kanäle
+    werden in einem Durchgang berechnet.
+    Parameter: telemetries (Liste von DataFrames mit Distance), channels, num_points
+    Return: dist_common (points), values (drivers x points x channels)
+    """
+    channels = list(channels)
+    dist_common = np.linspace(0, min(t['Distance'].max() for t in telemetries), num_points)
+
+    #stack all drivers into one sorted distance axis by shifting every driver by its own offset, so a single
+    #searchsorted finds the interpolation segment for every driver at once
+    distances = [t['Distance'].to_numpy(dtype=float) for t in telemetries]
+    lengths = np.array([len(d) for d in distances])
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    extent = max(d.max() for d in distances) - min(min(d.min() for d in distances), 0) + 1.0
+    offsets = np.arange(len(telemetries)) * extent
+
+    flat_dist = np.concatenate([d + o for d, o in zip(distances, offsets)])
+    flat_values = np.concatenate([t[channels].to_numpy(dtype=float) for t in telemetries])
+    grid = dist_common[None, :] + offsets[:, None]
+
+    #right index of the segment, clipped to the first/last segment of the driver for extrapolation
+    right = np.searchsorted(flat_dist, grid, side='right')
+    right = np.clip(right, starts[:, None] + 1, (starts + lengths - 1)[:, None])
+    left = right - 1
+
+    step = flat_dist[right] - flat_dist[left]
+    weight = np.divide(grid - flat_dist[left], step, out=np.zeros_like(grid), where=step != 0)
+    values = flat_values[left] + weight[:, :, None] * (flat_values[right] - flat_values[left])
+    return dist_common, values
+
+
+def lttb_indices(values, max_points: int):
+    """
+    Wählt mit Largest-Triangle-Three-Buckets höchstens max_points Punkte einer Kurve aus, welche die Form erhalten: pro
+    Bucket der Punkt, der mit dem zuletzt gewählten Punkt und dem Mittelwert des nächsten Buckets das grösste Dreieck
+    aufspannt. Die Kanäle werden gemeinsam betrachtet (z.B. X, Y und Geschwindigkeit), erster und letzter Punkt bleiben.
+    Parameter: values (Punkte x Kanäle, in Reihenfolge der Kurve), max_points
+    Return: indices (aufsteigend)
+    """
+    n = len(values)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    #bucket borders for the points between first and last
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    indices = np.empty(max_points, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+
+    for b in range(max_points - 2):
+        start, end = edges[b], edges[b + 1]
+        next_end = edges[b + 2] if b + 2 < len(edges) else n
+        a = values[indices[b]]
+        c = values[end:next_end].mean(axis=0)
+        #twice the triangle area for any number of channels: |ab|^2 |ac|^2 - (ab.ac)^2 = (|ab x ac|)^2
+        ab = values[start:end] - a
+        ac = c - a
+        area = (ab ** 2).sum(axis=1) * (ac @ ac) - (ab @ ac) ** 2
+        indices[b + 1] = start + int(np.argmax(area))
+    return indices
+
+
+def downsample_track(telemetry, max_points: int = TRACK_MAP_POINTS, color_channel: str = 'Speed'):
+    """
+    Reduziert die Telemetrie einer Runde für Streckengrafiken auf höchstens max_points Punkte. X und Y werden mit dem
+    gleichen Massstab, der Farbkanal auf die gleiche Spannweite normiert, so bleiben Kurven und Geschwindigkeitsspitzen
+    erhalten, während gerade Abschnitte mit wenigen Punkten auskommen. Minimum und Maximum des Farbkanals bleiben immer
+    (ab max_points=5, zwei Punkte sind für sie reserviert). Fehlende Werte werden für die Auswahl entlang der Runde
+    interpoliert, die zurückgegebenen Zeilen bleiben unverändert.
+    Parameter: telemetry (DataFrame mit X, Y und color_channel, in Fahrtreihenfolge), max_points, color_channel
+    Return: telemetry (ausgewählte Zeilen)
+    """
+    if len(telemetry) <= max_points:
+        return telemetry
+    #a single NaN would turn every range and every triangle area into NaN
+    channels = telemetry[['X', 'Y', color_channel]].astype(float).interpolate(limit_direction='both').fillna(0.0)
+    xy = channels[['X', 'Y']].to_numpy()
+    color = channels[color_channel].to_numpy()
+    extent = np.ptp(xy, axis=0).max() or 1.0
+    color_range = np.ptp(color) or 1.0
+    values = np.column_stack([(xy - xy.min(axis=0)) / extent, (color - color.min()) / color_range])
+
+    if max_points < 5:
+        return telemetry.iloc[lttb_indices(values, max_points)]
+    indices = lttb_indices(values, max_points - 2)
+    indices = np.union1d(indices, [np.argmin(color), np.argmax(color)])
+    return telemetry.iloc[indices]
@@ -0,0 +1,165 @@
+import argparse
+import json
+import logging
+
+import fastf1._api
+import fastf1.exceptions
+import numpy as np
+import pandas as pd
+
+from utils import race_store
+from utils.helper_functions import load_races, load_data
+from utils.profiling import span
+from utils.telemetry import TELEMETRY_CHANNELS, fastest_lap_telemetry, resample_telemetry
+
+#bump when the layout of the archive changes (channels, points per lap)
+ARCHIVE_VERSION = 1
+
+#points per resampled fastest lap, enough for smooth track maps at a fraction of the raw sample count
+ARCHIVE_POINTS = 1000
+
+ARCHIVE_DIR = race_store.STORE_DIR / f"telemetry_v{ARCHIVE_VERSION}"
+
+#errors of a single race while building the archive: no data from the api or network and disk errors (requests errors
+#are OSErrors), or telemetry without the archived channels; anything else is a bug and stops the build
+RACE_ERRORS = (OSError, KeyError, ValueError, fastf1.exceptions.DataNotLoadedError,
+               fastf1.exceptions.InvalidSessionError, fastf1.exceptions.NoLapDataError,
+               fastf1.exceptions.RateLimitExceededError, fastf1._api.SessionNotAvailableError)
+
+logger = logging.getLogger(__name__)
+
+
+def _archive_paths(year: int, race_nr: int):
+    base = ARCHIVE_DIR / str(year) / f"{int(race_nr):02d}"
+    return base.with_suffix('.npy'), base.with_suffix('.json')
+
+
+def race_archived(year: int, race_nr: int):
+    """
+    Prüft, ob die Telemetrie der schnellsten Runden eines Rennens im Archiv liegt.
+    Parameter: year, race_nr
+    Return: bool
+    """
+    _, index_path = _archive_paths(year, race_nr)
+    return index_path.exists()
+
+
+def archive_race(year: int, race_nr: int, session):
+    """
+    Resampelt die schnellste Runde jedes Fahrers (telemetry.fastest_lap_telemetry, wie in der App) auf ARCHIVE_POINTS
+    Punkte entlang der eigenen Rundendistanz und speichert alle Fahrer als ein Array (Fahrer x Punkte x Kanäle) plus
+    einen kleinen Index mit Fahrern und Rundenzeiten. Fahrer ohne gültige schnellste Runde werden übersprungen.
+    Parameter: year, race_nr, session (vollständig geladen)
+    Return: Anzahl archivierter Fahrer
+    """
+    drivers, lap_times, arrays = [], [], []
+    fastest = fastest_lap_telemetry(session, session.laps['Driver'].dropna().unique())
+    for driver, lap in fastest.items():
+        telemetry = lap['telemetry'][TELEMETRY_CHANNELS].astype(float)
+        _, values = resample_telemetry([telemetry], channels=TELEMETRY_CHANNELS, num_points=ARCHIVE_POINTS)
+        drivers.append(driver)
+        lap_times.append(lap['lap_time'].total_seconds())
+        arrays.append(values[0])
+
+    array_path, index_path = _archive_paths(year, race_nr)
+    array_path.parent.mkdir(parents=True, exist_ok=True)
+
+    values = np.array(arrays, dtype=np.float32).reshape(len(arrays), ARCHIVE_POINTS, len(TELEMETRY_CHANNELS))
+
+    def write_array(path):
+        #write through a file object, np.save would otherwise append .npy to the temporary name
+        with open(path, 'wb') as f:
+            np.save(f, values)
+
+    race_store.write_atomic(array_path, write_array)
+
+    #the index is written last and marks the race as archived
+    index = {'archive_version': ARCHIVE_VERSION, 'year': int(year), 'race_nr': int(race_nr),
+             'event_name': str(session.event['EventName']), 'channels': TELEMETRY_CHANNELS,
+             'drivers': drivers, 'lap_times': lap_times}
+    race_store.write_atomic(index_path, lambda p: p.write_text(json.dumps(index)))
+    return len(drivers)
+
+
+def open_race(year: int, race_nr: int):
+    """
+    Öffnet ein archiviertes Rennen memory-mapped, es werden erst beim Zugriff Daten von der Festplatte gelesen.
+    Parameter: year, race_nr
+    Return: index (dict), values (Fahrer x Punkte x Kanäle) oder None
+    """
+    array_path, index_path = _archive_paths(year, race_nr)
+    if not index_path.exists():
+        return None
+    index = json.loads(index_path.read_text())
+    values = np.load(array_path, mmap_mode='r')
+    return index, values
+
+
+def archived_fastest_laps(year: int, race_nr: int, drivers):
+    """
+    Gibt die archivierte Telemetrie der schnellsten Runden im gleichen Format wie telemetry.fastest_lap_telemetry zurück.
+    Fahrer ohne archivierte Runde fehlen im Ergebnis.
+    Parameter: year, race_nr, drivers (Abkürzungen)
+    Return: dict driver -> {'telemetry': DataFrame, 'lap_time': Timedelta}
+    """
+    with span('telemetry_archive.open'):
+        archived = open_race(year, race_nr)
+    if archived is None:
+        return {}
+    index, values = archived
+
+    result = {}
+    for driver in drivers:
+        if driver in index['drivers']:
+            i = index['drivers'].index(driver)
+            result[driver] = {
+                'telemetry': pd.DataFrame(values[i], columns=index['channels']),
+                'lap_time': pd.Timedelta(seconds=index['lap_times'][i]),
+            }
+    return result
+
+
+def archived_races(event_name: str = None):
+    """
+    Listet alle archivierten Rennen auf, optional gefiltert nach Eventname (z.B. für Vergleiche derselben Strecke über
+    mehrere Saisons).
+    Parameter: event_name (optional)
+    Return: DataFrame mit year, race_nr, event_name, drivers
+    """
+    rows = []
+    for index_path in sorted(ARCHIVE_DIR.glob('*/*.json')):
+        index = json.loads(index_path.read_text())
+        if event_name is None or index['event_name'] == event_name:
+            rows.append({key: index[key] for key in ('year', 'race_nr', 'event_name', 'drivers')})
+    return pd.DataFrame(rows, columns=['year', 'race_nr', 'event_name', 'drivers'])
+
+
+def build_archive(first_year: int, last_year: int, rebuild: bool = False):
+    """
+    Baut das Archiv offline für alle Rennen der angegebenen Saisons auf. Bereits archivierte Rennen werden übersprungen,
+    ein abgebrochener Lauf kann also einfach neu gestartet werden.
+    Parameter: first_year, last_year, rebuild
+    Return: None
+    """
+    for year in range(first_year, last_year + 1):
+        calendar = load_races(year)
+        for race_nr in calendar['RoundNumber']:
+            if race_archived(year, race_nr) and not rebuild:
+                continue
+            try:
+                session = load_data(year, race_nr, profile='full')
+                n_drivers = archive_race(year, race_nr, session)
+            except RACE_ERRORS as e:
+                logger.warning("%s Rennen %s: fehlgeschlagen (%s: %s)", year, race_nr, type(e).__name__, e)
+                continue
+            logger.info("%s Rennen %s: %s Fahrer archiviert", year, race_nr, n_drivers)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Baut das Telemetrie-Archiv der schnellsten Runden auf.")
+    parser.add_argument('first_year', type=int, nargs='?', default=2018)
+    parser.add_argument('last_year', type=int, nargs='?', default=2025)
+    parser.add_argument('--rebuild', action='store_true', help="bereits archivierte Rennen neu aufbauen")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    build_archive(args.first_year, args.last_year, rebuild=args.rebuild)
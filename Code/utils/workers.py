@@ -0,0 +1,482 @@
+import atexit
+import heapq
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import race_store
+from utils.app_init import lazy_import
+from utils.figure_cache import figure_cache, render_figure
+from utils.gaps import GAPS_TABLE
+from utils.helper_functions import cache_stats, load_clean_data
+from utils.profiling import merge_trace, record_totals, span, start_trace, stop_trace, tracing
+
+#the jobs need these modules in the worker processes, the app process only loads them when it runs a job itself
+charts = lazy_import('utils.charts')
+race_data = lazy_import('utils.race_data')
+standings = lazy_import('utils.standings')
+st = lazy_import('streamlit')
+
+#number of worker processes for loading, cleaning and rendering, '0' runs the jobs in threads of the app process
+WORKERS = int(os.environ.get('RACING_INSIGHTS_WORKERS', min(4, os.cpu_count() or 1)))
+
+#threads of the in-process backend (RACING_INSIGHTS_WORKERS=0)
+THREAD_WORKERS = 4
+
+#interval in which a page polls its job, in between streamlit can stop the rerun for a new selection of the user
+POLL_SECONDS = 0.2
+
+#priorities in the queue of a worker (lower runs first): a page waits for the result, prefetching in the background
+FOREGROUND = 0
+BACKGROUND = 1
+
+POOL_CLOSED = "Der Worker-Pool ist beendet."
+
+#figures rendered by the jobs of this process per chart, see process_stats
+_rendered = Counter()
+
+_local = threading.local()
+
+
+def _init_worker():
+    #ctrl+c stops the app, the executor shuts the workers down; figures are only rendered to bytes, never shown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    lazy_import('matplotlib').use('Agg')
+
+
+def _run_job(function, traced, *args):
+    #loads inside a job run directly instead of submitting another job (and waiting for a busy pool); if the page that
+    #submitted the job is traced, the spans of the job go back with the result (profiling panel and metrics)
+    _local.in_job = True
+    if traced:
+        start_trace(f"job.{function.__name__.lstrip('_')}")
+    try:
+        result = function(*args)
+    finally:
+        _local.in_job = False
+        spans = stop_trace() if traced else None
+    return result, spans
+
+
+def in_job():
+    """
+    Gibt zurück, ob der aufrufende Thread gerade einen Job ausführt (in einem Worker-Prozess oder im Thread-Backend).
+    Parameter: -
+    Return: bool
+    """
+    return getattr(_local, 'in_job', False)
+
+
+# --- jobs, executed in the worker processes ---
+
+def _clean_race(year: int, race_nr: int):
+    #the cleaned race goes to the race store, the app process reads it from there instead of receiving a pickled copy
+    load_clean_data(year, race_nr)
+
+
+def _compute_gaps(year: int, race_nr: int):
+    race_data.open_race_data(year, race_nr).gaps()
+
+
+def _season_standings(year: int, calendar):
+    return standings.update_standings(year, calendar)
+
+
+def _render(build, *args):
+    _rendered[build.__name__.removeprefix('build_').removesuffix('_figure')] += 1
+    #the matplotlib drawing and its serialization (figure.render in render_figure) are measured separately
+    with span('figure.build'):
+        fig = build(*args)
+    return render_figure(fig)
+
+
+def process_stats():
+    """
+    Gibt den Spitzenwert des Speichers (RSS), die cache_stats und die Anzahl gerenderter Grafiken pro Chart des
+    aktuellen Prozesses zurück (z.B. für Lasttests, siehe WorkerPool.worker_stats).
+    Parameter: -
+    Return: dict mit peak_rss_mb, cache_stats, figures_rendered
+    """
+    #only linux/macos have the resource module; ru_maxrss is in kilobytes on linux
+    import resource
+    return {'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'cache_stats': cache_stats(), 'figures_rendered': dict(_rendered)}
+
+
+def _speed_figure(year: int, race_nr: int, drivers, race_name):
+    race = race_data.open_race_data(year, race_nr)
+    fastest = race.fastest_laps(drivers)
+    if len(fastest) != len(drivers):
+        return None
+    return _render(charts.build_speed_figure, fastest, race.driver_info, drivers, year, race_name)
+
+
+def _position_figure(year: int, race_nr: int, drivers_abbr, y_axis_metric, race_name):
+    race = race_data.open_race_data(year, race_nr)
+    return _render(charts.build_position_figure, race, drivers_abbr, y_axis_metric, race_name)
+
+
+def _lap_times_figure(year: int, race_nr: int, drivers_abbr, hide_pit_laps, race_name, show_trends):
+    race = race_data.open_race_data(year, race_nr)
+    return _render(charts.build_lap_times_figure, race, drivers_abbr, hide_pit_laps, race_name, show_trends)
+
+
+def _points_figure(drivers, driver_series, highlight_drivers, year: int):
+    return _render(charts.build_points_figure, drivers, driver_series, highlight_drivers, year)
+
+
+#figure jobs per page, the first element of the figure key
+FIGURES = {
+    'Geschwindigkeit': _speed_figure,
+    'Positionsverlauf': _position_figure,
+    'Rundenzeiten': _lap_times_figure,
+    'Punkte': _points_figure,
+}
+
+#pages whose figure key starts with (page, season, round), their jobs go to the worker of the race
+RACE_FIGURES = ('Geschwindigkeit', 'Positionsverlauf', 'Rundenzeiten')
+
+
+class _Job(Future):
+    #future of a queued job, the executor only receives it once its worker is free
+    def __init__(self, key, function, args, on_result, priority, traced):
+        super().__init__()
+        self.key = key
+        self.function = function
+        self.args = args
+        self.on_result = on_result
+        self.priority = priority
+        self.traced = traced
+        self.worker = None
+        self.started = False
+        #spans recorded by the job, see await_job
+        self.spans = None
+
+
+class _Worker:
+    #one worker process (or thread) with its own priority queue, at most one job at a time is handed to the executor
+    def __init__(self):
+        self.executor = None
+        self.queue = []
+        self.busy = False
+
+
+class WorkerPool:
+    """
+    Job-Queue vor Worker-Prozessen (oder Threads mit max_workers=0). Das Laden, Bereinigen und Rendern läuft so
+    ausserhalb der Streamlit-Threads und verteilt sich auf mehrere Kerne, statt sich im App-Prozess um das GIL zu
+    streiten. Jeder Worker hat eine eigene Prioritäts-Queue: Jobs, auf die eine Page wartet (FOREGROUND), laufen vor
+    dem Prefetching (BACKGROUND). Jobs eines Rennens gehen immer an denselben Worker, so bleibt dessen Session-Cache warm
+    und die volle Session wird nicht in jedem Prozess geladen. Pro Schlüssel gibt es höchstens einen offenen Job, gleiche
+    Anfragen anderer Sessions erhalten denselben Future. Die Prozesse werden erst beim ersten Job gestartet.
+    """
+
+    def __init__(self, max_workers: int = WORKERS):
+        self.max_workers = max_workers
+        self._workers = [_Worker() for _ in range(max_workers if max_workers > 0 else THREAD_WORKERS)]
+        self._jobs = {}
+        #reentrant: a job that is already done when it is handed over finishes in the dispatching thread
+        self._lock = threading.RLock()
+        self._counter = itertools.count()
+        self._stats = Counter()
+        self._closed = False
+
+    def _executor(self, worker):
+        if self._closed:
+            raise RuntimeError(POOL_CLOSED)
+        if worker.executor is None:
+            if self.max_workers > 0:
+                #spawn instead of fork: the app process has threads (sessions, prefetch) that must not be copied
+                worker.executor = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn'),
+                                                      initializer=_init_worker)
+            else:
+                worker.executor = ThreadPoolExecutor(1, thread_name_prefix='worker')
+        return worker.executor
+
+    def _pick(self, race):
+        if race is not None:
+            #consecutive rounds (the prefetched neighbours) land on different workers
+            return self._workers[(int(race[0]) * 100 + int(race[1])) % len(self._workers)]
+        return min(self._workers, key=lambda worker: len(worker.queue) + worker.busy)
+
+    def _enqueue(self, job):
+        heapq.heappush(job.worker.queue, (job.priority, next(self._counter), job))
+
+    def _dispatch(self, worker):
+        while not worker.busy and worker.queue:
+            priority, _, job = heapq.heappop(worker.queue)
+            #skip entries left behind by a promoted job
+            if job.started or priority != job.priority or not job.set_running_or_notify_cancel():
+                continue
+            job.started = True
+            try:
+                running = self._submit(worker, job)
+            except Exception as e:
+                #e.g. the pool was shut down: the job fails and the worker goes on with the next one
+                self._forget(job, e)
+                job.set_exception(e)
+                continue
+            worker.busy = True
+            running.add_done_callback(lambda done, worker=worker, job=job: self._finish(worker, job, done))
+
+    def _submit(self, worker, job):
+        try:
+            return self._executor(worker).submit(_run_job, job.function, job.traced, *job.args)
+        except BrokenProcessPool:
+            #the worker process died while idle, the job goes to a new one
+            worker.executor = None
+            self._stats['restarts'] += 1
+            return self._executor(worker).submit(_run_job, job.function, job.traced, *job.args)
+
+    def _forget(self, job, error):
+        #bookkeeping of a finished job, called with the lock held
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        self._stats['failed' if error is not None else 'completed'] += 1
+
+    def _finish(self, worker, job, done):
+        #cancelled by shutdown() before the worker started it
+        error = CancelledError() if done.cancelled() else done.exception()
+        result = None
+        if error is None:
+            result, job.spans = done.result()
+            #spans of a worker process are not in the metrics of this process yet (threads count them themselves)
+            if job.spans and self.max_workers > 0:
+                record_totals(job.spans)
+            if job.on_result is not None:
+                try:
+                    job.on_result(result)
+                except Exception as e:
+                    error = e
+        with self._lock:
+            if isinstance(error, BrokenProcessPool):
+                #the worker process died, the next job of this worker starts a new one
+                worker.executor = None
+                self._stats['restarts'] += 1
+            self._forget(job, error)
+            worker.busy = False
+        #the job is resolved before the next one is handed over, nothing that goes wrong there can leave it open
+        if error is not None:
+            job.set_exception(error)
+        else:
+            job.set_result(result)
+        with self._lock:
+            self._dispatch(worker)
+
+    def _promote(self, job):
+        #called with the lock held; the old queue entry is skipped by _dispatch
+        if not job.started and job.priority != FOREGROUND:
+            job.priority = FOREGROUND
+            self._enqueue(job)
+            self._stats['promoted'] += 1
+            self._dispatch(job.worker)
+
+    def promote(self, key):
+        """
+        Holt einen Job, der noch als Prefetch in der Queue steht, vor die anderen Prefetches (z.B. wenn eine Page auf
+        ein Rennen wartet, das ein Prefetch-Thread eingereiht hat).
+        Parameter: key
+        Return: None
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._promote(job)
+
+    def submit(self, key, function, *args, on_result=None, race=None, background: bool = False):
+        """
+        Reiht einen Job ein, ausser für den Schlüssel läuft schon einer. Wartet eine Page auf einen Job, der noch als
+        Prefetch in der Queue steht, wird er nach vorne geholt. Fällt ein Worker-Prozess aus, wird er beim nächsten Job
+        neu gestartet.
+        Parameter: key (hashbares Tuple), function (Job auf Modulebene), args, on_result (optional, wird im App-Prozess
+                   mit dem Resultat aufgerufen, bevor der Job als erledigt gilt), race (year, race_nr: immer derselbe
+                   Worker), background (Prefetching, läuft nach allen Jobs, auf die eine Page wartet)
+        Return: Future
+        """
+        priority = BACKGROUND if background else FOREGROUND
+        traced = tracing()
+        with self._lock:
+            if self._closed:
+                job = Future()
+                job.set_exception(RuntimeError(POOL_CLOSED))
+                return job
+            job = self._jobs.get(key)
+            if job is not None:
+                self._stats['joined'] += 1
+                if not job.started:
+                    job.traced = job.traced or traced
+                    if priority == FOREGROUND:
+                        self._promote(job)
+                return job
+            job = _Job(key, function, args, on_result, priority, traced)
+            job.worker = self._pick(race)
+            self._jobs[key] = job
+            self._stats['submitted'] += 1
+            self._enqueue(job)
+            self._dispatch(job.worker)
+        return job
+
+    def shutdown(self):
+        """
+        Bricht alle Jobs in den Queues ab und beendet die Worker, ohne auf laufende Jobs zu warten. Wird beim Beenden
+        des Prozesses aufgerufen (atexit), danach schlägt jeder neue Job fehl, statt ewig in der Queue zu warten.
+        Parameter: -
+        Return: None
+        """
+        with self._lock:
+            self._closed = True
+            queued = [job for worker in self._workers for _, _, job in worker.queue]
+            executors = [worker.executor for worker in self._workers if worker.executor is not None]
+            for worker in self._workers:
+                worker.queue.clear()
+            for job in queued:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+        for job in queued:
+            job.cancel()
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def worker_stats(self):
+        """
+        Gibt process_stats jedes gestarteten Worker-Prozesses zurück. Die Abfrage läuft als Job im Prozess selbst, nach
+        dem Job, der gerade bearbeitet wird. Im Thread-Backend gibt es keine eigenen Prozesse, die Werte stehen im
+        App-Prozess.
+        Parameter: -
+        Return: Liste von dicts (leer im Thread-Backend oder vor dem ersten Job)
+        """
+        if self.max_workers == 0:
+            return []
+        with self._lock:
+            executors = [worker.executor for worker in self._workers if worker.executor is not None]
+        stats = []
+        for executor in executors:
+            try:
+                stats.append(executor.submit(process_stats).result())
+            except (BrokenProcessPool, RuntimeError):
+                continue
+        return stats
+
+    def stats(self):
+        """
+        Gibt die Anzahl eingereihter, mitbenutzter, vorgezogener, erledigter und fehlgeschlagener Jobs und die offenen
+        Jobs zurück.
+        Parameter: -
+        Return: dict
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._jobs)
+            stats['background_queued'] = sum(job.priority == BACKGROUND and not job.started
+                                             for job in self._jobs.values())
+        stats['workers'] = self.max_workers
+        return stats
+
+
+#one pool per app process, shared by all pages and sessions
+pool = WorkerPool()
+atexit.register(pool.shutdown)
+
+
+def _done(result):
+    job = Future()
+    job.set_result(result)
+    return job
+
+
+def load_race(year: int, race_nr: int, background: bool = False):
+    """
+    Gibt driver_info und laps eines Rennens zurück. Fehlt das Rennen im Race Store, wird es im Worker-Prozess des
+    Rennens geladen und bereinigt und danach aus dem Store gelesen. Innerhalb eines Jobs und im Thread-Backend wird
+    direkt im aufrufenden Thread geladen: ein Job, der auf einen Job desselben Pools wartet, kann sonst alle Threads
+    blockieren (z.B. eine Grafik, die auf das Rennen wartet, dessen Bereinigung hinter ihr in der Queue steht).
+    Parameter: year, race_nr, background (Prefetching)
+    Return: driver_info, laps
+    """
+    year, race_nr = int(year), int(race_nr)
+    inline = in_job() or pool.max_workers == 0
+    if not inline and not (race_store.race_path(year, race_nr) / 'meta.json').exists():
+        with span('workers.clean_race'):
+            pool.submit(('race', year, race_nr), _clean_race, year, race_nr, race=(year, race_nr),
+                        background=background).result()
+    return load_clean_data(year, race_nr)
+
+
+def promote_race(year: int, race_nr: int):
+    """
+    Holt das Bereinigen eines Rennens vor die Prefetches, falls es noch in der Queue steht.
+    Parameter: year, race_nr
+    Return: None
+    """
+    pool.promote(('race', int(year), int(race_nr)))
+
+
+def submit_gaps(year: int, race_nr: int):
+    """
+    Reiht die Berechnung der Abstände pro Minisektor eines Rennens ein, falls sie noch nicht im Race Store liegen.
+    Parameter: year, race_nr
+    Return: Future (danach liefert RaceData.gaps die Abstände aus dem Store)
+    """
+    year, race_nr = int(year), int(race_nr)
+    if race_store.race_table_exists(year, race_nr, GAPS_TABLE):
+        return _done(None)
+    return pool.submit(('gaps', year, race_nr), _compute_gaps, year, race_nr, race=(year, race_nr))
+
+
+def season_standings(year: int, calendar):
+    """
+    Gibt den Punkteverlauf einer Saison zurück (standings.update_standings), berechnet in einem Worker-Prozess. Die
+    Schleife über die neuen Rennen der Saison läuft so nicht im Streamlit-Thread.
+    Parameter: year, calendar (mit RoundNumber und EventName)
+    Return: standings, failures
+    """
+    key = ('season', int(year)) + tuple(int(round_nr) for round_nr in calendar['RoundNumber'])
+    with span('workers.season_standings'):
+        return pool.submit(key, _season_standings, int(year), calendar).result()
+
+
+def submit_figure(key, *args):
+    """
+    Gibt die gerenderte Grafik zu einem Schlüssel (page, season, round, drivers, options) als Future zurück: aus dem
+    Figure-Cache oder von einem Job, der sie in einem Worker-Prozess erstellt und rendert (siehe FIGURES). Das Resultat
+    wird im Figure-Cache des App-Prozesses abgelegt.
+    Parameter: key (hashbares Tuple, das erste Element ist die Page), args (Argumente des Jobs der Page)
+    Return: Future mit PNG-Bytes (None, wenn die Grafik nicht erstellt werden kann)
+    """
+    cache_key = ('png',) + tuple(key)
+    data = figure_cache.get(cache_key)
+    if data is not None:
+        return _done(data)
+
+    def cache(data):
+        if data is not None:
+            figure_cache.put(cache_key, data)
+
+    race = key[1:3] if key[0] in RACE_FIGURES else None
+    return pool.submit(('figure',) + cache_key, FIGURES[key[0]], *args, on_result=cache, race=race)
+
+
+def await_job(job, message: str):
+    """
+    Wartet in einer Page auf einen Job: sein Status (Warteschlange oder in Arbeit) wird alle POLL_SECONDS abgefragt und
+    angezeigt. Dazwischen kann Streamlit den Rerun abbrechen, wenn der User eine neue Auswahl trifft; der Job läuft
+    weiter und sein Resultat liegt beim nächsten Mal im Cache.
+    Parameter: job (Future), message (Text des Spinners)
+    Return: Resultat des Jobs
+    """
+    if not job.done():
+        status = st.empty()
+        with span('workers.wait'), st.spinner(message):
+            while not job.done():
+                status.caption("Wird berechnet ..." if job.running() else "In der Warteschlange ...")
+                time.sleep(POLL_SECONDS)
+        status.empty()
+    #the spans of the job (loading, figure.build, figure.render) appear in the trace of this rerun
+    merge_trace(getattr(job, 'spans', None))
+    return job.result()